@@ -0,0 +1,134 @@
+import numpy as np
+
+
+class SpectrumAnalyzer:
+    """Band energies, loudness and onsets of the audio being played, for the visuals to react to.
+
+    The output is pushed in as it is mixed and kept, downmixed to mono, in a
+    ring of the last window_size frames. analyze() runs once per rendered frame:
+    it Hann-windows the ring into a preallocated frame, takes its rFFT and sums
+    the power spectrum into bands with one matrix product, so apart from numpy's
+    own FFT result nothing is allocated and a frame costs a few tens of
+    microseconds.
+
+    Results live in one flat float64 array (see the index constants), which can
+    be handed in as a view of shared memory so another process can read them;
+    audio_parameters() maps them onto the keys the visuals' own
+    get_audio_parameters() use.
+    A band has an onset when its energy rises ONSET_RATIO above its running
+    average, flagged only in the analysis where it crosses.
+    """
+    BAND_EDGES = (30.0, 60.0, 120.0, 250.0, 500.0, 1000.0, 2000.0, 4000.0, 8000.0, 16000.0)
+    NUM_BANDS = len(BAND_EDGES) - 1
+    RMS, ONSET, CENTROID, LEVELS = range(4)  # NUM_BANDS levels from LEVELS on, then NUM_BANDS onset flags
+    VALUES_SIZE = LEVELS + 2 * NUM_BANDS
+    FLOOR_DB = -80.0  # Band level that reads as 0; full scale reads as 1
+    ONSET_RATIO = 2.0
+    ONSET_FLOOR_DB = -50.0  # Quieter bands never flag onsets
+    SMOOTHING = 0.8  # Weight the running band averages keep from one analysis to the next
+
+    def __init__(self, sample_rate, window_size=2048, values=None):
+        self.sample_rate = sample_rate
+        self.window_size = window_size
+        self.ring = np.zeros(window_size, dtype=np.float32)  # Mono output, oldest frame at position
+        self.position = 0
+        self.values = np.zeros(self.VALUES_SIZE) if values is None else values
+
+        self.window = np.hanning(window_size)
+        self._frame = np.zeros(window_size)
+        self._power = np.zeros(window_size // 2 + 1)
+        self._energies = np.zeros(self.NUM_BANDS)
+        self._average = np.zeros(self.NUM_BANDS)
+        self._rising = np.zeros(self.NUM_BANDS, dtype=bool)  # Bands above their onset threshold last time
+        self._above = np.zeros(self.NUM_BANDS, dtype=bool)
+        # Row b sums the bins of band b, scaled so a full-scale sine reads as 0 dB
+        self._bins = bins = np.fft.rfftfreq(window_size, 1 / sample_rate)
+        edges = np.array(self.BAND_EDGES)
+        self.bands = ((bins >= edges[:-1, None]) & (bins < edges[1:, None])) * (2 / self.window.sum()) ** 2
+
+    @property
+    def rms(self):
+        return self.values[self.RMS]
+
+    @property
+    def onset(self):
+        """Whether any band had an onset in the last analysis."""
+        return bool(self.values[self.ONSET])
+
+    @property
+    def centroid(self):
+        """Spectral centroid in Hz, 0 for silence."""
+        return self.values[self.CENTROID]
+
+    @property
+    def levels(self):
+        """Each band's energy in dB mapped from FLOOR_DB .. 0 onto 0 .. 1, lowest band first."""
+        return self.values[self.LEVELS:self.LEVELS + self.NUM_BANDS]
+
+    @property
+    def onsets(self):
+        """1 for each band with an onset in the last analysis, else 0."""
+        return self.values[self.LEVELS + self.NUM_BANDS:]
+
+    def audio_parameters(self):
+        """The analysis as a visual parameters dict: bass drives zoom, brightness rotation, loudness color."""
+        levels = self.levels
+        loudness = 1 + 20 * np.log10(max(self.rms, 1e-9)) / 60  # -60 dBFS .. 0 onto 0 .. 1
+        brightness = np.log2(max(self.centroid, 1.0) / 125) / 7  # 125 Hz .. 16 kHz onto 0 .. 1
+        return {
+            'zoom_level': 0.5 + 1.5 * float(np.mean(levels[:3])),
+            'rotation_angle': 90 * min(max(float(brightness), 0.0), 1.0),
+            'color_intensity': min(max(float(loudness), 0.0), 1.0),
+            'pattern_density': float(np.mean(levels[5:])),
+            'pan_x': 0,
+            'pan_y': 0,
+        }
+
+    def reset(self):
+        self.ring[:] = 0
+        self.values[:] = 0
+        self._average[:] = 0
+        self._rising[:] = False
+
+    def push(self, frames):
+        """Add (frames, channels) or mono (frames,) output to the window."""
+        frames = frames[-self.window_size:]
+        count = len(frames)
+        first = min(count, self.window_size - self.position)
+        for target, source in ((self.ring[self.position:self.position + first], frames[:first]),
+                               (self.ring[:count - first], frames[first:])):
+            if source.ndim == 1:
+                target[:] = source
+            else:
+                np.sum(source, axis=1, out=target)
+                target *= 1.0 / source.shape[1]
+        self.position = (self.position + count) % self.window_size
+
+    def analyze(self):
+        """Update the results from the window as it stands; returns self."""
+        # Unroll the ring into time order while windowing it
+        tail = self.window_size - self.position
+        np.multiply(self.ring[self.position:], self.window[:tail], out=self._frame[:tail])
+        np.multiply(self.ring[:self.position], self.window[tail:], out=self._frame[tail:])
+        np.abs(np.fft.rfft(self._frame), out=self._power)
+        self._power *= self._power
+        np.dot(self.bands, self._power, out=self._energies)
+
+        total = self._power.sum()
+        self.values[self.CENTROID] = np.dot(self._bins, self._power) / total if total > 0 else 0.0
+        self.values[self.RMS] = np.sqrt(np.dot(self.ring, self.ring) / self.window_size)
+        onsets, levels = self.onsets, self.levels
+        np.greater(self._energies, self.ONSET_RATIO * self._average, out=self._above)
+        self._above &= self._energies > 10 ** (self.ONSET_FLOOR_DB / 10)
+        np.greater(self._above, self._rising, out=onsets, casting='unsafe')
+        self._rising[:] = self._above
+        self.values[self.ONSET] = onsets.any()
+        self._average *= self.SMOOTHING
+        self._average += (1 - self.SMOOTHING) * self._energies
+
+        np.maximum(self._energies, 10 ** (self.FLOOR_DB / 10), out=levels)
+        np.log10(levels, out=levels)
+        levels *= -10 / self.FLOOR_DB
+        levels += 1
+        np.minimum(levels, 1.0, out=levels)
+        return self
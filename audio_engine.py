@@ -1,14 +1,256 @@
+import heapq
+import threading
+import time
+import warnings
+from collections import OrderedDict
+
 import numpy as np
 import pygame
-import pretty_midi
+
+import music_theory
+from analysis import SpectrumAnalyzer
+from audio_output import SoundDeviceOutput
+from dsp_graph import LFO, Delay, Envelope, Gain, Graph, Mix, Node, Noise, Oscillator, Partials, Signal
+from effects import PeakLimiter
+from grains import EventChannel, GrainEngine
+from recorder import WavRecorder
+from reverb import ConvolutionReverb, load_impulse_response, synthetic_impulse_response
+from scheduler import Scheduler
+from spatial import SourceVoices
+from synthesis import (LoopBaker, LoopPlayer, OscillatorBank, SpectralBank, decimation_factor, harmonic_stack_table,
+                       render_multirate)
+from track import WavTrack
+from voices import Voice, VoiceAllocator
+
+class NoiseBank:
+    """Large precomputed white, pink and brown noise tables served as views.
+
+    Blocks are read at a random offset (and, for white noise, a random stride)
+    so consecutive blocks don't repeat, without generating or allocating noise
+    per call. refill() regenerates the tables from a seeded np.random.Generator
+    and can run periodically on a background thread.
+    """
+    KINDS = ('white', 'pink', 'brown')
+    MAX_WHITE_STRIDE = 4
+
+    def __init__(self, size=2 ** 20, seed=None):
+        self.size = size
+        block_seed, table_seed = np.random.SeedSequence(seed).spawn(2)
+        self._rng = np.random.default_rng(block_seed)  # Offsets, used by the audio side only
+        self._table_rng = np.random.default_rng(table_seed)  # Table contents, used by refill()
+        self._stop_refill = threading.Event()
+        self.refill()
+
+    def _shaped(self, white, exponent):
+        """White noise with its power spectrum tilted by 1 / f ** exponent, at unit variance."""
+        spectrum = np.fft.rfft(white)
+        frequencies = np.arange(len(spectrum), dtype=np.float64)
+        frequencies[0] = 1.0
+        spectrum *= frequencies ** (-exponent / 2)
+        spectrum[0] = 0.0
+        shaped = np.fft.irfft(spectrum, len(white))
+        return shaped / shaped.std()
+
+    def refill(self):
+        white = self._table_rng.standard_normal(self.size)
+        tables = {
+            'white': white.astype(np.float32),
+            'pink': self._shaped(white, 1).astype(np.float32),
+            'brown': self._shaped(white, 2).astype(np.float32),
+        }
+        for table in tables.values():
+            table.setflags(write=False)
+        self.tables = tables  # Swapped in one assignment, so readers never see a half-built set
+
+    def start_refill(self, interval=10.0):
+        """Regenerate the tables every interval seconds on a daemon thread."""
+        def refill_loop():
+            while not self._stop_refill.wait(interval):
+                self.refill()
+        threading.Thread(target=refill_loop, daemon=True).start()
+
+    def stop_refill(self):
+        self._stop_refill.set()
+
+    def block(self, kind, num_samples):
+        """A read-only view of num_samples of unit-variance noise of the given kind."""
+        table = self.tables[kind]
+        stride = int(self._rng.integers(1, self.MAX_WHITE_STRIDE + 1)) if kind == 'white' else 1
+        stride = min(stride, max(1, (self.size - 1) // max(num_samples, 1)))
+        offset = int(self._rng.integers(0, self.size - (num_samples - 1) * stride))
+        return table[offset:offset + num_samples * stride:stride]
 
 class AudioEngine:
-    def __init__(self, sample_rate=44100, duration=0.1, current_volume=0.2):
+    BUFFER_CACHE_SIZE = 32  # Time axes and envelopes kept around for reuse
+    STEAL_FADE = 256  # Frames over which a stolen streaming voice fades out
+    MAX_SOUND_SECONDS = 2.5  # Size of the preallocated frame buffers modes render into
+    EVENT_SPREAD = 1 / 30  # Seconds over which one visual frame's events are scattered
+    TRACK_BLOCK_SECONDS = 0.5  # Length of the track blocks queued on pygame's mixer
+    HEARD_SECONDS = 1.0  # Most of pygame's output one update() rebuilds for the analyzer
+
+    def __init__(self, sample_rate=44100, duration=0.1, current_volume=0.2, backend='auto'):
         self.sample_rate = sample_rate
         self.duration = duration
         self.muted = False
         self.mode = AudioEngine.DefaultAudioMode(self)  # Set the default mode
         self.current_volume = current_volume
+        self._buffer_cache = OrderedDict()  # Read-only time axes and envelopes, least recently used first
+        self.loops = LoopBaker(sample_rate)  # Baked loops shared by the stationary modes
+        self.noise = NoiseBank()
+
+        # Continuous sounddevice output, falling back to pygame's mixer when it can't be opened.
+        # Any other backend (e.g. None) leaves it to the caller to attach_output() or use pygame.
+        self.output = None
+        self._mix_buffer = None
+        if backend in ('auto', 'sounddevice'):
+            output = None
+            try:
+                output = SoundDeviceOutput(sample_rate)
+                output.start()
+            except Exception:
+                if output is not None:
+                    output.close()  # The stream opened but wouldn't start
+                if backend == 'sounddevice':
+                    raise
+            else:
+                self.attach_output(output)
+        self.voices = VoiceAllocator()
+        self.scheduler = Scheduler(sample_rate)
+        self.parameters = {}  # Latest visual parameters, read when each scheduled note fires
+        self._clock_start = time.monotonic()  # Stands in for the output's frame clock with pygame
+        self._released = []  # Stolen streaming voices still fading out
+        self._free_buffers = []  # (N, 2) float32 buffers voices are rendered into, recycled when they finish
+        self._pcm16 = None  # int16 frames handed to pygame
+        self.reverb = None  # Master ConvolutionReverb on the streaming output, see set_reverb()
+        self.events = EventChannel()  # Visual events waiting to become grains, see add_events()
+        self.grains = GrainEngine(sample_rate)
+        self.sources = SourceVoices(sample_rate)  # Positioned visual objects, see set_sources()
+        self.limiter = PeakLimiter(sample_rate)  # Last stage before the samples become integers
+        self.analyzer = SpectrumAnalyzer(sample_rate)  # What is being played, for the visuals to react to
+        self._heard_frame = 0  # Frame of the pygame clock the analyzer last caught up to
+        self._heard = None  # Frames pygame's mixer played since then
+        self._track_heard = None
+        self.recorder = None  # WavRecorder archiving the streaming output, see start_recording()
+        self.midi = None  # MidiOutput the composing modes' notes go to instead, see attach_midi()
+        self._midi_ends = []  # Heap of the frames the notes sent to it end on
+        self.track = None  # WavTrack playing in place of the modes, see play_track()
+        self._track_channel = None  # pygame channel reserved for the track's blocks
+        self._track_block = None  # Float frames of the next block handed to pygame
+        self._track_pcm = None  # The same as int16
+        self._track_queued = 0  # Frames of the track handed to pygame so far
+        self._track_started = 0.0  # When pygame would have started the track, had it never run dry
+
+    @classmethod
+    def mode_classes(cls):
+        """Every audio mode nested in AudioEngine, in definition order."""
+        return [mode for mode in cls.__dict__.values()
+                if isinstance(mode, type) and issubclass(mode, cls.BaseAudioMode)
+                and mode not in (cls.BaseAudioMode, cls.LayeredAudioMode, cls.GraphAudioMode, cls.MixedAudioMode)]
+
+    def set_mode(self, mode_name):
+        self.mode = next(mode for mode in self.mode_classes() if mode.__name__ == mode_name)(self)
+
+    def set_layers(self, layers):
+        """Play several modes at once, given as (mode name, gain) pairs, through a MixedAudioMode."""
+        self.mode = AudioEngine.MixedAudioMode(self, layers)
+
+    def attach_output(self, output):
+        """Stream through a RingOutput (or subclass) instead of pygame's mixer."""
+        self.output = output
+        self._mix_buffer = np.zeros((output.ring.capacity, output.ring.channels), dtype=np.float32)
+
+    def attach_midi(self, midi):
+        """Send the notes of modes that compose() them to a MidiOutput instead of synthesizing them.
+
+        Those modes then cost next to nothing in-process; the others play as before.
+        """
+        self.midi = midi
+
+    def _clock(self):
+        """Frames heard so far: those the device has read, or pygame's wall-clock stand-in."""
+        if self.output is not None:
+            return self.output.ring.read_index
+        return int((time.monotonic() - self._clock_start) * self.sample_rate)
+
+    def _frame_buffer(self):
+        return np.empty((int(self.MAX_SOUND_SECONDS * self.sample_rate), 2), dtype=np.float32)
+
+    def _take_buffer(self):
+        return self._free_buffers.pop() if self._free_buffers else self._frame_buffer()
+
+    def _reap(self):
+        for voice in self.voices.reap(time.monotonic()):
+            if voice.buffer is not None:
+                self._free_buffers.append(voice.buffer)
+
+    def add_events(self, events):
+        """Queue visual events, (kind, x, y, intensity) tuples, to be played as grains on the next update().
+
+        Grains are mixed into the streaming output; with pygame's mixer they are dropped.
+        """
+        self.events.push(events)
+
+    def set_sources(self, positions, levels=None):
+        """Give every positioned visual object a voice: (n, 2) x, y screen fractions and optional (n,) levels.
+
+        The voices are panned to their objects and mixed into the streaming output.
+        """
+        self.sources.set_sources(positions, levels)
+
+    def play_track(self, path, loop=False):
+        """Play a WAV file in place of the generative modes until it ends or stop_track() is called.
+
+        The file streams from a memory map, so it can be hours long; it has to
+        be at the engine's sample rate. On the streaming output muting holds it where it is.
+        """
+        track = WavTrack(path, loop)
+        if track.sample_rate != self.sample_rate:
+            track.close()
+            raise ValueError(f"{path} is at {track.sample_rate} Hz but the engine runs at {self.sample_rate} Hz")
+        self.stop_track()
+        self.track = track
+        self._track_queued = 0
+
+    def stop_track(self):
+        if self.track is None:
+            return
+        if self._track_channel is not None:
+            self._track_channel.stop()
+        self.track.close()
+        self.track = None
+
+    def start_recording(self, path):
+        """Archive everything played from now on to a 16-bit WAV file, written from a background thread.
+
+        The streaming output is recorded exactly as it goes to the device. pygame's
+        mixer can't be tapped and its mix can only be approximated again, so
+        recording needs the streaming output.
+        """
+        if self.output is None:
+            raise RuntimeError("Recording needs the streaming output, pygame's mixer can't be recorded")
+        self.stop_recording()
+        self.recorder = WavRecorder(path, self.sample_rate)
+
+    def stop_recording(self):
+        if self.recorder is not None:
+            self.recorder.close()
+            self.recorder = None
+
+    def set_reverb(self, impulse_response=None, wet=0.3):
+        """Put a convolution reverb on the streaming output's master bus.
+
+        impulse_response is a (frames[, channels]) array, a WAV path, or None for the
+        procedural hall. Set reverb to None to take it off again. pygame's mixer
+        has no master bus to put it on, so without a streaming output it only
+        takes effect once one is attached.
+        """
+        if self.output is None:
+            warnings.warn("The reverb only plays on the streaming output, not through pygame's mixer", RuntimeWarning)
+        if impulse_response is None:
+            impulse_response = synthetic_impulse_response(self.sample_rate)
+        elif isinstance(impulse_response, str):
+            impulse_response = load_impulse_response(impulse_response, self.sample_rate)
+        self.reverb = ConvolutionReverb(impulse_response, wet=wet)
 
     def set_volume(self, volume):
         if volume < 0:
@@ -20,42 +262,305 @@ class AudioEngine:
 
     def note_to_frequency(self, note_name):
         """Convert a note name (e.g., 'C4') to its frequency in Hz."""
-        midi_note = pretty_midi.note_name_to_number(note_name)
-        frequency = pretty_midi.note_number_to_hz(midi_note)
-        return frequency
-
-    def generate_tone_with_envelope(self, audio_parameters):
-        return self.mode.generate_sound(**audio_parameters)
+        return music_theory.note_to_frequency(note_name)
+
+    def _cached_buffer(self, key, build):
+        buffer = self._buffer_cache.get(key)
+        if buffer is None:
+            buffer = build()
+            buffer.setflags(write=False)
+            self._buffer_cache[key] = buffer
+            if len(self._buffer_cache) > self.BUFFER_CACHE_SIZE:
+                self._buffer_cache.popitem(last=False)
+        else:
+            self._buffer_cache.move_to_end(key)
+        return buffer
+
+    def time_axis(self, duration):
+        """Shared read-only time axis of the given duration in seconds."""
+        num_samples = int(self.sample_rate * duration)
+        return self._cached_buffer(('time', duration, num_samples),
+                                   lambda: np.linspace(0, duration, num_samples, False))
+
+    def envelope(self, num_samples, fade_length):
+        """Shared read-only envelope of ones with linear attack and release ramps."""
+        def build():
+            envelope = np.ones(num_samples)
+            envelope[:fade_length] = np.linspace(0, 1, fade_length)
+            envelope[-fade_length:] = np.linspace(1, 0, fade_length)
+            return envelope
+        return self._cached_buffer(('envelope', num_samples, fade_length), build)
+
+    def generate_tone_with_envelope(self, audio_parameters, out=None):
+        """Synthesize the current mode's next sound as (N, 2) float32 frames, written into out if given.
+
+        Returns None without synthesizing anything when the sound would not be played.
+        """
+        if self.muted:
+            return None
+        self.voices.max_voices = self.mode.MAX_POLYPHONY
+        self.voices.steal_policy = self.mode.STEAL_POLICY
+        self._reap()
+        if not self.voices.has_slot():
+            self.voices.skipped += 1
+            return None
+        return self.mode.generate_sound(out=out, **audio_parameters)
+
+    def generate_batch(self, parameters):
+        """Sounds for many frames of visual parameters at once, e.g. to pre-render a stretch offline.
+
+        Each row of the parameters matrix is one frame: zoom_level, rotation_angle,
+        color_intensity and pattern_density, optionally followed by pan_x and pan_y.
+        Returns the current mode's sound for every row, as generate_sound() would
+        make them one after another: a (rows, N, 2) float32 array, or a list of
+        (N, 2) arrays for modes whose sounds vary in length.
+        """
+        return self.mode.generate_batch(np.atleast_2d(np.asarray(parameters, dtype=np.float64)))
 
     def generate_chord(self, base_frequency, octave_multiplier=1):
         """Generate a chord based on the base frequency and the current mode's scale."""
         base_note_index = self.mode.scale.index(self.mode.base_note_name)
         chord_indices = [base_note_index] + [base_note_index + i for i in self.mode.chord_intervals]
-        chord_frequencies = [base_frequency * (2 ** (i / 12)) for i in chord_indices]
-        return [freq * octave_multiplier for freq in chord_frequencies]
+        return base_frequency * octave_multiplier * music_theory.SEMITONE_RATIOS[chord_indices]
 
     def generate_melodic_pattern(self, octave_multiplier, length=4):
         # Start from base note
         start_index = self.mode.scale.index(self.mode.base_note_name)
         # Create a sequence of "length" notes climbing the scale from the base note
         pattern_indices = [(start_index + i) % len(self.mode.scale) for i in range(length)]
-        # Convert note names to frequencies
-        pattern_frequencies = [pretty_midi.note_name_to_number(self.mode.scale[i] + str(octave_multiplier)) for i in pattern_indices]
-        pattern_frequencies = [pretty_midi.note_number_to_hz(freq) for freq in pattern_frequencies]
-        return pattern_frequencies
+        # Look the notes up in the scale's precomputed frequency table
+        return music_theory.scale_frequencies(self.mode.scale)[int(octave_multiplier), pattern_indices]
+
+    def set_parameters(self, audio_parameters):
+        """Store the latest visual parameters for the scheduler to use."""
+        self.parameters = audio_parameters
+
+    def update(self):
+        """Synthesize every grid step inside the lookahead window, keep the output fed and analyze it.
+
+        Call this once per rendered frame; how often notes fire depends on the
+        tempo and the mode's SUBDIVISION, not on the frame rate. The analysis
+        in self.analyzer is what the visuals read back.
+        """
+        events = self.events.drain()
+        if self.track is not None and self.track.finished:
+            # Streamed tracks are done once mixed; on pygame the last block has to finish playing
+            if self.output is not None or self._track_channel is None or not self._track_channel.get_busy():
+                self.stop_track()
+        if self.muted:
+            if self.output is not None:
+                self._fill_output()  # Keep the stream fed with silence
+            else:
+                self._hear_mixer()  # Sounds already started play on
+            if self.midi is not None:
+                self.midi.update(self._clock())  # Notes already started still end
+            self.analyzer.analyze()
+            return
+
+        self.scheduler.subdivision = self.mode.SUBDIVISION
+        if self.output is not None:
+            now = self.output.ring.write_index
+            self.grains.trigger(events, now, int(self.EVENT_SPREAD * self.sample_rate))
+            horizon = now + self.output.frames_needed() + self.scheduler.lookahead_frames()
+        else:
+            # pygame can only start sounds right away, so steps fire on the first frame after they are due
+            now = horizon = self._clock()
+
+        # A playing track stands in for the modes; the scheduler skips the steps it covered once it ends
+        for start_frame in self.scheduler.due(now, horizon) if self.track is None else ():
+            if self.midi is not None and hasattr(self.mode, 'compose'):
+                if self._midi_slot(start_frame):
+                    note, _, seconds = self.mode.compose(**self.parameters)
+                    self.midi.play(note, start_frame, seconds)
+                    heapq.heappush(self._midi_ends, start_frame + int(seconds * self.sample_rate))
+                continue
+            # Pooled on pygame too: _hear_mixer() reads the voices back after the mixer has copied them
+            buffer = self._take_buffer()
+            sound = self.generate_tone_with_envelope(self.parameters, out=buffer)
+            if sound is not None:
+                self._start_voice(sound, start_frame, buffer)
+            else:
+                self._free_buffers.append(buffer)
+        if self.midi is not None:
+            self.midi.update(self._clock())
+
+        if self.output is not None:
+            self._fill_output()
+        else:
+            if self.track is not None:
+                self._queue_track()
+            self._hear_mixer()
+        self.analyzer.analyze()
+
+    def _midi_slot(self, start_frame):
+        """Whether a note starting at start_frame fits within the mode's MAX_POLYPHONY on the MIDI output.
+
+        Notes already sent can't be stolen back, so a full MIDI output skips the
+        step as a mode without a STEAL_POLICY would.
+        """
+        while self._midi_ends and self._midi_ends[0] <= start_frame:
+            heapq.heappop(self._midi_ends)
+        if len(self._midi_ends) < self.mode.MAX_POLYPHONY:
+            return True
+        self.voices.skipped += 1
+        return False
+
+    def _queue_track(self):
+        """Keep a block of the track queued behind the one pygame is playing."""
+        if self._track_channel is None:
+            pygame.mixer.set_reserved(1)
+            self._track_channel = pygame.mixer.Channel(0)
+            self._track_block = np.empty((int(self.TRACK_BLOCK_SECONDS * self.sample_rate), 2), dtype=np.float32)
+            self._track_pcm = np.empty(self._track_block.shape, dtype=np.int16)
+        if self.track.finished or self._track_channel.get_queue() is not None:
+            return
+        if not self._track_channel.get_busy():  # First block, or pygame ran dry
+            self._track_started = time.monotonic() - self._track_queued / self.sample_rate
+        count = self.track.read_into(self._track_block)
+        np.clip(self._track_block, -1, 1, out=self._track_block)
+        np.multiply(self._track_block, 32767, out=self._track_pcm, casting='unsafe')
+        sound = pygame.sndarray.make_sound(self._track_pcm[:count])
+        sound.set_volume(self.current_volume)
+        self._track_channel.queue(sound)
+        self._track_queued += count
+
+    def _hear_mixer(self):
+        """Push what pygame's mixer has played since the last call into the analyzer.
+
+        Sounds handed to pygame can't be tapped, so the frames are mixed again
+        from each playing voice's start time, at most HEARD_SECONDS of them.
+        """
+        now = time.monotonic()
+        frame = int((now - self._clock_start) * self.sample_rate)
+        count = min(frame - self._heard_frame, int(self.HEARD_SECONDS * self.sample_rate))
+        self._heard_frame = frame
+        if self._heard is None:
+            self._heard = np.empty((int(self.HEARD_SECONDS * self.sample_rate), 2), dtype=np.float32)
+        heard = self._heard[:count]
+        heard.fill(0)
+        for voice in self.voices.voices:
+            frames = voice.sound if voice.sound.ndim == 2 else voice.sound[:, None]
+            end = max(int((now - voice.started_at) * self.sample_rate), 0)
+            start = max(end - count, 0)
+            chunk = frames[start:end]
+            heard[start - (end - count):start - (end - count) + len(chunk)] += chunk
+        if self.track is not None and self.track.num_frames:
+            end = min(int((now - self._track_started) * self.sample_rate), self._track_queued)
+            if self._track_heard is None:
+                self._track_heard = np.empty_like(self._heard)
+            block = self._track_heard[:count]
+            lead = min(max(count - end, 0), count)  # Frames from before the track started
+            block[:lead] = 0
+            self.track.read_wrapped(end - count + lead, block[lead:])
+            heard += block
+        heard *= self.current_volume
+        self.analyzer.push(heard)
 
     def play_sound(self, sound_array):
+        """Play mono (N,) or stereo (N, 2) frames; None just keeps the voices already playing going."""
         if self.muted:
             return
+        if sound_array is not None:
+            self._start_voice(sound_array)
+        if self.output is not None:
+            self._fill_output()
+
+    def _start_voice(self, sound_array, start_frame=None, buffer=None):
+        """Start playing sound_array; buffer is the pooled array it was rendered into, if any."""
+        frames = sound_array if sound_array.ndim == 2 else sound_array[:, None]  # Mono plays on both channels
+        if self.output is not None:
+            if start_frame is None:
+                start_frame = self.output.ring.write_index
+            voice = Voice(frames, time.monotonic(), start_frame=start_frame)
+            if buffer is not None:
+                if frames.base is buffer:
+                    voice.buffer = buffer
+                else:  # The mode needed more room than the buffer had
+                    self._free_buffers.append(buffer)
+            for stolen in self.voices.allocate(voice):
+                stolen.release(self.STEAL_FADE)  # Copies the tail, so the buffer is free again
+                if stolen.buffer is not None:
+                    self._free_buffers.append(stolen.buffer)
+                    stolen.buffer = None
+                self._released.append(stolen)
+            return
 
-        """Play a sound from a numpy array."""
-        # Convert mono sound to stereo
-        stereo_sound = np.vstack([sound_array, sound_array]).T
-        # Ensure the array is C-contiguous
-        contiguous_array = np.ascontiguousarray(stereo_sound)
-        sound = pygame.sndarray.make_sound(np.int16(contiguous_array * 32767))
+        # Limit and convert to pygame's int16 frames in a single pass, into a reused buffer
+        if self._pcm16 is None or len(self._pcm16) < len(frames):
+            self._pcm16 = np.empty((max(len(frames), int(self.MAX_SOUND_SECONDS * self.sample_rate)), 2), dtype=np.int16)
+        pcm = self._pcm16[:len(frames)]
+        scale = self.limiter.sound_gains(frames)[:, None]
+        scale *= 32767
+        np.multiply(frames, scale, out=pcm, casting='unsafe')
+        sound = pygame.sndarray.make_sound(pcm)
         sound.set_volume(self.current_volume)
-        sound.play()
+        channel = sound.play()
+        if channel is None:  # Every mixer channel is busy
+            if buffer is not None:
+                self._free_buffers.append(buffer)
+            return
+        now = time.monotonic()
+        voice = Voice(sound_array, now, now + len(sound_array) / self.sample_rate)
+        voice.channel = channel
+        if buffer is not None:
+            if sound_array.base is buffer:
+                voice.buffer = buffer
+            else:
+                self._free_buffers.append(buffer)
+        for stolen in self.voices.allocate(voice):
+            stolen.channel.fadeout(int(1000 * self.STEAL_FADE / self.sample_rate))
+            if stolen.buffer is not None:
+                self._free_buffers.append(stolen.buffer)
+                stolen.buffer = None
+
+    def _fill_output(self):
+        """Mix the playing voices into the streaming output until its ring buffer is topped up."""
+        frames = self.output.frames_needed()
+        if frames == 0:
+            return
+        block_start = self.output.ring.write_index
+        mix = self._mix_buffer[:frames]
+        mix.fill(0)
+        if self.muted:
+            self._play_mix(mix)
+            return
+        for voice in self.voices.voices + self._released:
+            offset = max(voice.start_frame - block_start, 0)
+            if offset >= frames:
+                continue  # Scheduled for a later block
+            chunk = voice.sound[voice.position:voice.position + frames - offset]
+            mix[offset:offset + len(chunk)] += chunk
+            voice.position += len(chunk)
+        if self.track is not None:
+            self.track.add_into(mix)
+        self._reap()
+        self._released = [voice for voice in self._released if not voice.finished(None)]
+        self.grains.render(mix, block_start)
+        self.sources.render(mix)
+
+        if self.reverb is not None:
+            self.reverb.process(mix, out=mix)
+        mix *= self.current_volume
+        self.limiter.process(mix, out=mix)
+        self._play_mix(mix)
+
+    def _play_mix(self, mix):
+        """Hand a finished block to the output and to whatever listens to it."""
+        self.output.write(mix)
+        self.analyzer.push(mix)
+        if self.recorder is not None:
+            self.recorder.record(mix)
+
+    def close(self):
+        self.noise.stop_refill()
+        self.stop_track()
+        self.stop_recording()
+        if self.midi is not None:
+            self.midi.close()
+            self.midi = None
+        if self.output is not None:
+            self.output.close()
+            self.output = None
 
     def mute(self):
         self.muted = True
@@ -66,6 +571,11 @@ class AudioEngine:
 
     # Base class for audio modes
     class BaseAudioMode:
+        MAX_POLYPHONY = 8  # Voices of this mode that may play at once
+        SUBDIVISION = 4  # Scheduler steps per beat, i.e. how often a new sound starts
+        STEAL_POLICY = 'oldest'  # 'oldest', 'quietest' or None to skip new sounds while full
+        BATCH_FRAMES = 2 ** 16  # Frames of sound generate_batch() synthesizes per pass, which bounds its memory
+
         DEFAULTS = {
             'zoom_level': 1.0,
             'rotation_angle': 0.0,
@@ -83,468 +593,587 @@ class AudioEngine:
             self.scale = self.scales[0]
             self.base_note_name = self.scale[0]  # Default to the first note of the scale
 
-        def generate_sound(self, **kwargs):
+        def generate_sound(self, out=None, **kwargs):
+            """Render the next sound as C-contiguous (N, 2) float32 frames, into out when it is big enough."""
+            signal = self.synthesize(**kwargs)
+            frames = self.output_frames(out, len(signal))
+            frames[:] = signal[:, None]  # Mono to both channels and down to float32 in one pass
+            return frames
+
+        def synthesize(self, **kwargs):
+            """Return the next sound as a mono float array."""
             raise NotImplementedError("Each audio mode must implement this method.")
 
+        def generate_batch(self, parameters):
+            """One sound per row of a parameters matrix whose columns follow DEFAULTS; see AudioEngine.generate_batch.
+
+            Calls generate_sound() row by row; modes that can synthesize every row in
+            one broadcast pass override this.
+            """
+            return [self.generate_sound(**dict(zip(self.DEFAULTS, row))).copy() for row in parameters]
+
+        def batch_chunks(self, parameters, num_frames):
+            """Split a parameters matrix into runs of rows worth about BATCH_FRAMES frames of sound.
+
+            Yields each run's first row, its number of rows and its parameters dict, which
+            holds a (rows, 1) column for every key the matrix has and the default for the rest.
+            """
+            step = max(1, self.BATCH_FRAMES // num_frames)
+            for start in range(0, len(parameters), step):
+                rows = parameters[start:start + step]
+                chunk = dict(self.DEFAULTS)
+                for index, key in enumerate(list(self.DEFAULTS)[:rows.shape[1]]):
+                    chunk[key] = rows[:, index:index + 1]
+                yield start, len(rows), chunk
+
+        @staticmethod
+        def output_frames(out, num_frames):
+            if out is not None and len(out) >= num_frames:
+                return out[:num_frames]
+            return np.empty((num_frames, 2), dtype=np.float32)
+
+    class LayeredAudioMode(BaseAudioMode):
+        """Base for modes that sum independent layers, each driven by a few visual parameters.
+
+        LAYERS maps a layer name to the parameters it reads, and layer_<name>(t, **inputs)
+        renders it. A layer is only re-synthesized when one of its inputs has moved by
+        more than its quantum since the layer was last rendered; otherwise the cached
+        buffer is reused. STOCHASTIC_LAYERS (noise) are rendered every time.
+
+        Modes whose layers are periodic set LOOP_SECONDS instead: the deterministic
+        layers are then baked into one seamless loop per coarsely quantized parameter
+        state and streamed, crossfading whenever the state changes.
+
+        BANDWIDTHS tags layers that never go above some frequency, in Hz or as a
+        function of the layer's inputs; they are synthesized at a reduced sample
+        rate and interpolated back up (see synthesis.render_multirate).
+        """
+        LAYERS = {}
+        STOCHASTIC_LAYERS = ()
+        BANDWIDTHS = {}
+        QUANTUM = 0.01
+        QUANTA = {'rotation_angle': 0.5}  # Most visuals report rotation in degrees
+        FADE_LENGTH = 1000
+        LOOP_SECONDS = None
+        LOOP_QUANTUM = 0.05
+        LOOP_QUANTA = {'rotation_angle': 5.0}
+
+        def __init__(self, audio_engine):
+            super().__init__(audio_engine)
+            self._layer_cache = {}  # Layer name -> (inputs it was rendered with, buffer)
+            self.layers_rendered = 0
+            self.layers_reused = 0
+            self.loop_player = LoopPlayer(audio_engine.loops.crossfade)
+
+        def _is_current(self, cached_inputs, inputs):
+            return all(abs(inputs[key] - value) <= self.QUANTA.get(key, self.QUANTUM)
+                       for key, value in cached_inputs.items())
+
+        def synthesize_layer(self, name, t, inputs):
+            render = getattr(self, 'layer_' + name)
+            bandwidth = self.BANDWIDTHS.get(name)
+            if bandwidth is None:
+                return render(t, **inputs)
+            if callable(bandwidth):
+                bandwidth = np.max(bandwidth(**inputs))  # Inputs are columns when batching
+            return render_multirate(lambda low_rate_t: render(low_rate_t, **inputs),
+                                    t[0], len(t), self.audio_engine.sample_rate, bandwidth)
+
+        def render_layer(self, name, t, parameters):
+            inputs = {key: parameters[key] for key in self.LAYERS[name]}
+            if name in self.STOCHASTIC_LAYERS:
+                self.layers_rendered += 1
+                return self.synthesize_layer(name, t, inputs)
+
+            cached = self._layer_cache.get(name)
+            if cached is not None and len(cached[1]) == len(t) and self._is_current(cached[0], inputs):
+                self.layers_reused += 1
+                return cached[1]
+
+            buffer = self.synthesize_layer(name, t, inputs)
+            buffer.setflags(write=False)
+            self._layer_cache[name] = (inputs, buffer)
+            self.layers_rendered += 1
+            return buffer
+
+        def _baked_loop(self, parameters):
+            """The loop of every deterministic layer for the parameters' quantized state."""
+            steps = {key: round(parameters[key] / self.LOOP_QUANTA.get(key, self.LOOP_QUANTUM))
+                     for inputs in self.LAYERS.values() for key in inputs}
+            quantized = {key: step * self.LOOP_QUANTA.get(key, self.LOOP_QUANTUM) for key, step in steps.items()}
+
+            def render(num_samples):
+                t = np.arange(num_samples) / self.audio_engine.sample_rate
+                return sum(self.synthesize_layer(name, t, {key: quantized[key] for key in inputs})
+                           for name, inputs in self.LAYERS.items() if name not in self.STOCHASTIC_LAYERS)
+
+            key = (type(self).__name__,) + tuple(sorted(steps.items()))
+            return self.audio_engine.loops.loop(key, render, self.LOOP_SECONDS)
+
+        def synthesize(self, **kwargs):
+            parameters = {key: kwargs.get(key, default) for key, default in self.DEFAULTS.items()}
+            t = self.audio_engine.time_axis(self.audio_engine.duration)
+
+            # Combine all layers
+            if self.LOOP_SECONDS:
+                combined = self.loop_player.read(self._baked_loop(parameters), len(t))
+                for name in self.STOCHASTIC_LAYERS:
+                    combined += self.render_layer(name, t, parameters)
+            else:
+                combined = np.zeros(len(t))
+                for name in self.LAYERS:
+                    combined += self.render_layer(name, t, parameters)
+
+            # Apply an envelope for smoothness
+            combined *= self.audio_engine.envelope(len(t), self.FADE_LENGTH)
+            return combined
+
+        def generate_batch(self, parameters):
+            """Layers are functions of t and their inputs, so fed (rows, 1) columns they render every row at once.
+
+            Noise layers are still drawn row by row, and looping modes just copy from
+            their baked loops frame by frame.
+            """
+            if self.LOOP_SECONDS:
+                return super().generate_batch(parameters)
+            t = self.audio_engine.time_axis(self.audio_engine.duration)
+            envelope = self.audio_engine.envelope(len(t), self.FADE_LENGTH)
+            sounds = np.empty((len(parameters), len(t), 2), dtype=np.float32)
+            for start, num_rows, chunk in self.batch_chunks(parameters, len(t)):
+                combined = np.zeros((num_rows, len(t)))
+                for name, keys in self.LAYERS.items():
+                    inputs = {key: chunk[key] for key in keys}
+                    if name in self.STOCHASTIC_LAYERS:
+                        for row in range(num_rows):
+                            combined[row] += self.synthesize_layer(name, t, {key: np.ravel(value)[row] for key, value in inputs.items()})
+                    else:
+                        combined += self.synthesize_layer(name, t, inputs)
+                combined *= envelope
+                sounds[start:start + num_rows] = combined[:, :, None]
+            return sounds
+
+    class GraphAudioMode(BaseAudioMode):
+        """Base for modes described as a dsp_graph.Graph instead of hand-written array code.
+
+        build_graph() returns the output node, or a (left, right) pair for stereo;
+        controls read the visual parameters as callables of the parameters dict. The
+        graph is built once; each sound renders the engine's duration plus SECONDS.
+
+        Sets of partials come from partial_bank(): per-partial np.sin by default, or
+        inverse-FFT synthesis with ADDITIVE = 'spectral', whose cost barely grows
+        with the number of partials.
+        """
+        SECONDS = 0.0  # Added to the engine's duration to get each sound's length
+        ADDITIVE = 'oscillators'  # 'oscillators' or 'spectral'
+
+        def __init__(self, audio_engine):
+            super().__init__(audio_engine)
+            outputs = self.build_graph()
+            if isinstance(outputs, Node):
+                outputs = [outputs]
+            self.graph = Graph(outputs, audio_engine.sample_rate, self.num_frames())
+
+        def build_graph(self):
+            raise NotImplementedError("Each graph mode must implement this method.")
+
+        def partial_bank(self):
+            if self.ADDITIVE == 'spectral':
+                return SpectralBank(self.audio_engine.sample_rate)
+            return OscillatorBank(self.audio_engine.sample_rate)
+
+        def num_frames(self):
+            return int(self.audio_engine.sample_rate * (self.audio_engine.duration + self.SECONDS))
+
+        def generate_sound(self, out=None, **kwargs):
+            parameters = {key: kwargs.get(key, default) for key, default in self.DEFAULTS.items()}
+            outputs = self.graph.render(self.num_frames(), parameters)
+            frames = self.output_frames(out, len(outputs[0]))
+            if len(outputs) == 1:
+                frames[:] = outputs[0][:, None]
+            else:
+                frames[:, 0] = outputs[0]
+                frames[:, 1] = outputs[1]
+            return frames
+
+        def generate_batch(self, parameters):
+            """Renders runs of rows as consecutive blocks of one batched Graph.render() call each."""
+            num_frames = self.num_frames()
+            sounds = np.empty((len(parameters), num_frames, 2), dtype=np.float32)
+            for start, num_rows, chunk in self.batch_chunks(parameters, num_frames):
+                outputs = self.graph.render(num_frames, chunk, num_rows)
+                sounds[start:start + num_rows, :, 0] = outputs[0]
+                sounds[start:start + num_rows, :, 1] = outputs[-1]
+            return sounds
+
+    class MixedAudioMode(BaseAudioMode):
+        """Several modes playing at once, each scaled by its own gain.
+
+        Every step the layers due on it render into one scratch buffer in turn and
+        are added into a single accumulator, the out buffer the engine hands over.
+        The bus steps as often as its busiest layer; slower layers only render on
+        the steps that fall on their own grid. Overloads are left to the engine's
+        PeakLimiter.
+        """
+
+        def __init__(self, audio_engine, layers=()):
+            super().__init__(audio_engine)
+            self.layers = []  # [mode, gain] pairs
+            self.step = 0
+            self._layer_buffer = audio_engine._frame_buffer()
+            for mode_name, gain in layers:
+                self.add_layer(mode_name, gain)
+
+        def add_layer(self, mode_name, gain=1.0):
+            mode_class = next(mode for mode in self.audio_engine.mode_classes() if mode.__name__ == mode_name)
+            self.layers.append([mode_class(self.audio_engine), gain])
+            modes = [mode for mode, _ in self.layers]
+            self.SUBDIVISION = max(mode.SUBDIVISION for mode in modes)
+            self.MAX_POLYPHONY = max(mode.MAX_POLYPHONY for mode in modes)
+            self.STEAL_POLICY = None if any(mode.STEAL_POLICY is None for mode in modes) else 'oldest'
+
+        def set_gain(self, mode_name, gain):
+            for layer in self.layers:
+                if type(layer[0]).__name__ == mode_name:
+                    layer[1] = gain
+
+        def generate_sound(self, out=None, **kwargs):
+            accumulator = out if out is not None else self.audio_engine._frame_buffer()
+            num_frames = 0
+            for mode, gain in self.layers:
+                if self.step % max(1, self.SUBDIVISION // mode.SUBDIVISION):
+                    continue
+                frames = mode.generate_sound(out=self._layer_buffer, **kwargs)
+                if len(frames) > len(accumulator):  # Longer than the buffers the engine hands out
+                    grown = np.empty((len(frames), 2), dtype=np.float32)
+                    grown[:num_frames] = accumulator[:num_frames]
+                    accumulator = grown
+                if len(frames) > num_frames:
+                    accumulator[num_frames:len(frames)] = 0
+                    num_frames = len(frames)
+                frames *= gain
+                accumulator[:len(frames)] += frames
+            self.step += 1
+            return accumulator[:num_frames]
+
     # Default audio mode
     class DefaultAudioMode(BaseAudioMode):
+        STEAL_POLICY = None  # Notes last up to 2 s, so let them ring out instead of cutting them off
+        SUBDIVISION = 2
+
         def __init__(self, audio_engine):
             super().__init__(audio_engine)
-            self.scales = [
-                ["C", "D", "E", "F", "G", "A", "B"],  # Major
-                ["C", "D", "Eb", "F", "G", "Ab", "Bb"],  # Natural Minor
-                ["C", "Db", "Eb", "E", "Gb", "Ab", "Bb"],  # Phrygian
-                ["C", "D", "E", "F#", "G", "A", "B"],  # Lydian
-                ["C", "D", "E", "F", "G", "A", "Bb"],  # Mixolydian
-                ["C", "D", "Eb", "F", "G", "Ab", "B"],  # Harmonic minor
-                ["C", "D", "E", "F", "G", "A", "Bb"],  # Dorian
-                ["C", "D", "Eb", "F", "G", "Ab", "Bb"],  # Pentatonic
-                ["C", "Db", "E", "F", "Gb", "Ab", "Bb"]  # Locrian
-            ]
+            self.scales = list(music_theory.SCALES.values())
             self.scale = self.scales[0]  # Default to Major scale
-            self.chord_intervals = [0, 4, 7]  # Major triad chord intervals
+            self.chord_intervals = music_theory.CHORDS['major']  # Major triad chord intervals
             self.base_note_name = "C"  # Default base note
 
-        def generate_sound(self, **kwargs):
-            # Extract the parameters you care about
+        def compose(self, **kwargs):
+            """The musical decisions behind the next sound: its MIDI note, frequency in Hz and length in seconds.
+
+            The scale follows the zoom level; the note, octave and rhythm are
+            random. Both synthesize() and the MIDI backend play what this returns.
+            """
             zoom_level = kwargs.get('zoom_level', self.DEFAULTS['zoom_level'])
-            """Generate a tone based on the zoom level and apply an envelope."""
             self.scale = self.scales[int(zoom_level * len(self.scales)) % len(self.scales)]
 
-            # Choose a random starting note
+            # Random note and octave
             note_index = np.random.choice(len(self.scale))
-            base_note_name = self.scale[note_index]
-
-            # Randomly choose an octave
             octave = np.random.choice(["3", "4", "5"])
-            # Randomly choose an octave multiplier
-            octave_multiplier = np.random.choice([1, 2, 4])
+            frequency = music_theory.scale_frequencies(self.scale)[int(octave), note_index]
+            note = music_theory.note_name_to_number(self.scale[note_index] + octave)
 
-            # Convert base note to frequency
-            base_frequency = pretty_midi.note_name_to_number(base_note_name + octave)
-            base_frequency = pretty_midi.note_number_to_hz(base_frequency)
+            # A new base note for the chords and melodic patterns
+            self.base_note_name = self.scale[np.random.choice(len(self.scale))]
 
-            # Choose a random starting note
-            note_index = np.random.choice(len(self.scale))
-            self.base_note_name = self.scale[note_index]
-
-            # Define rhythmic patterns
-            rhythms = [0.25, 0.25, 0.5, 0.5, 0.5, 1]
-            rhythm_factor = np.random.choice(rhythms)
-            t = np.linspace(0, 2*rhythm_factor, int(self.audio_engine.sample_rate * rhythm_factor * 2), False)
-
-            # Generate the tone with a lower maximum frequency for a mellow sound
-            frequency = base_frequency if np.random.rand() < 0.9 else base_frequency * 2
-            tone = 0.3 * np.sin(frequency * t * 2 * np.pi)
-
-            # Generate the tone with a lower maximum frequency for a mellow sound
-            frequency = base_frequency if np.random.rand() < 0.9 else base_frequency * 2
-            tone = 0.3 * np.sin(frequency * t * 2 * np.pi)  # Lower amplitude also helps get a mellow sound
-
-            # Apply an envelope to the tone to avoid harsh starts/stops
-            envelope_size = int(rhythm_factor * self.audio_engine.sample_rate)  # Access sample_rate through audio_engine
-            envelope = np.ones_like(tone)
-            envelope[:envelope_size] = np.linspace(0, 1, envelope_size)
-            envelope[-envelope_size:] = np.linspace(1, 0, envelope_size)
-
-            # Reduce amplitude to limit distortion
-            tone = 0.5 * tone
-
-            # Apply an envelope to the tone to avoid harsh starts/stops
-            envelope = np.ones_like(tone)
-            envelope[:100] = np.linspace(0, 1, 100)
-            envelope[-100:] = np.linspace(1, 0, 100)
-            tone_with_envelope = tone * envelope
-
-            # Add melodic patterns (arpeggios, leaps, and steps)
-            if np.random.rand() < 0.5:  # 50% chance to add a melodic pattern
-                step = np.random.choice([-2, -1, 1, 2])  # Choose a step size (up or down)
-                note_index = (note_index + step) % len(self.scale)  # Move to the next note in the scale
-                next_note_name = self.scale[note_index]
-                next_frequency = pretty_midi.note_name_to_number(next_note_name + octave)
-                next_frequency = pretty_midi.note_number_to_hz(next_frequency)
-                next_tone = np.sin(next_frequency * t * 2 * np.pi)
-                tone_with_envelope = np.concatenate([tone_with_envelope, next_tone])
-
-
-            # # Generate the chord frequencies
-            # chord_frequencies = self.generate_chord(base_frequency, octave)
-
-            # # Generate the tone for each frequency in the chord and sum them
-            # tone = sum([np.sin(freq * t * 2 * np.pi) for freq in chord_frequencies[:2]])
-            # # Apply an envelope to the tone to avoid harsh starts/stops
-            # envelope = np.ones_like(tone)
-            # envelope[:100] = np.linspace(0, 1, 100)
-            # envelope[-100:] = np.linspace(1, 0, 100)
-            # chord_tone_with_envelope = tone * envelope
-
-            # # Generate melodic pattern and repeat the process
-            # pattern_frequencies = self.generate_melodic_pattern(octave)[:3]
-            # pattern_tone_with_envelope = sum([np.sin(freq * t * 2 * np.pi) for freq in pattern_frequencies])
-
-            # Either generate a chord tone or a melodic pattern with 50% chance each
-            coin_toss = np.random.rand()
-            tone_with_envelope = tone * envelope
-            if coin_toss < 0.5:  # Generate chord
-                chord_frequencies = self.audio_engine.generate_chord(base_frequency, octave_multiplier)
-                chords = sum([np.sin(freq * t * 2 * np.pi) for freq in chord_frequencies])
-                tone_with_envelope = np.concatenate([tone_with_envelope, chords])
-            else:  # Generate melodic pattern
-                if np.random.rand() < 0.25:  # Only generate a melodic pattern 25% of the time
-                    pattern_frequencies = self.audio_engine.generate_melodic_pattern(octave, length=np.random.choice([1, 2]))  # 1 or 2 note patterns
-                    patterns = sum([np.sin(freq * t * 2 * np.pi) for freq in pattern_frequencies])
-                    tone_with_envelope = np.concatenate([tone_with_envelope, patterns])
-
-            tone_with_envelope = tone * envelope
-
-            return tone_with_envelope
-    class PulsatingAudioMode(BaseAudioMode):
-        def __init__(self, audio_engine):
-            super().__init__(audio_engine)
+            # Rhythm: the note lasts twice the chosen factor
+            rhythm_factor = np.random.choice([0.25, 0.25, 0.5, 0.5, 0.5, 1])
 
-        def generate_sound(self, **kwargs):
-            """Generate an enhanced pulsating tone based on various visualization factors."""
+            # One note in ten jumps up an octave
+            if np.random.rand() >= 0.9:
+                frequency *= 2
+                note += 12
 
-            zoom_level = kwargs.get('zoom_level', self.DEFAULTS['zoom_level'])  # Replace default_value with a suitable default
-            rotation_angle = kwargs.get('rotation_angle', self.DEFAULTS['rotation_angle'])
-            color_intensity = kwargs.get('color_intensity', self.DEFAULTS['color_intensity'])
-            pattern_density = kwargs.get('pattern_density', self.DEFAULTS['pattern_density'])
+            return note, frequency, 2 * rhythm_factor
+
+        def synthesize(self, **kwargs):
+            """Generate a tone based on the zoom level and apply an envelope."""
+            _, frequency, seconds = self.compose(**kwargs)
+            t = self.audio_engine.time_axis(seconds)
+            # A low amplitude keeps it mellow, and the short fades keep the start and end from clicking
+            tone = 0.5 * (0.3 * np.sin(frequency * t * 2 * np.pi))
+            return tone * self.audio_engine.envelope(len(tone), 100)
+
+    class PulsatingAudioMode(GraphAudioMode):
+        def build_graph(self):
+            """An enhanced pulsating tone based on various visualization factors."""
 
             # Dynamic base frequency based on zoom level and rotation angle
-            base_frequency = 220.0 + 220.0 * zoom_level + rotation_angle  # Vary with zoom and rotation
+            def base_frequency(p):
+                return 220.0 + 220.0 * p['zoom_level'] + p['rotation_angle']  # Vary with zoom and rotation
 
-            t = np.linspace(0, self.audio_engine.duration, int(self.audio_engine.sample_rate * self.audio_engine.duration), False)
+            # Base tone and harmonic overtones influenced by pattern density
+            combined_tone = Partials(self.partial_bank(),
+                                     lambda p: base_frequency(p) * np.array([1, 2, 3]),
+                                     lambda p: [1.0, 0.5 * p['pattern_density'], 0.3 * (1 - p['pattern_density'])])
 
             # Pulsation effect influenced by color intensity
-            modulator_frequency = 2.0 + 10.0 * zoom_level + 5.0 * color_intensity
-            pulsation_depth = 0.5 + 0.5 * zoom_level
-            modulator = pulsation_depth * (1.0 + np.sin(2 * np.pi * modulator_frequency * t))
+            pulsation_depth = lambda p: 0.5 + 0.5 * p['zoom_level']
+            modulator = LFO(lambda p: 2.0 + 10.0 * p['zoom_level'] + 5.0 * p['color_intensity'],
+                            depth=pulsation_depth, offset=pulsation_depth)
 
-            # Base tone with harmonic overtones influenced by pattern density
-            tone = np.sin(2 * np.pi * base_frequency * t)
-            harmonic1 = 0.5 * pattern_density * np.sin(2 * np.pi * 2 * base_frequency * t)
-            harmonic2 = 0.3 * (1 - pattern_density) * np.sin(2 * np.pi * 3 * base_frequency * t)
-            combined_tone = tone + harmonic1 + harmonic2
+            # Apply the pulsating effect and an envelope
+            return Envelope(Gain(combined_tone, modulator), 100)
 
-            # Apply the pulsating effect
-            pulsating_tone = combined_tone * modulator
+        def generate_sound(self, out=None, **kwargs):
+            frames = super().generate_sound(out, **kwargs)
 
             # Dynamic rhythmic patterns based on color intensity
+            color_intensity = kwargs.get('color_intensity', self.DEFAULTS['color_intensity'])
             if color_intensity > 0.7:  # Introduce rhythmic breaks for high color intensities
-                break_point = np.random.randint(len(t) // 2, len(t) - 100)
-                pulsating_tone[break_point:break_point+100] = 0
+                self.rhythmic_break(frames)
+            return frames
 
-            # Apply an envelope to the tone
-            envelope = np.ones_like(pulsating_tone)
-            envelope[:100] = np.linspace(0, 1, 100)
-            envelope[-100:] = np.linspace(1, 0, 100)
-            pulsating_tone_with_envelope = pulsating_tone * envelope
+        def generate_batch(self, parameters):
+            sounds = super().generate_batch(parameters)
+            if parameters.shape[1] > 2:
+                for row in np.flatnonzero(parameters[:, 2] > 0.7):
+                    self.rhythmic_break(sounds[row])
+            return sounds
 
-            return pulsating_tone_with_envelope
+        @staticmethod
+        def rhythmic_break(frames):
+            break_point = np.random.randint(len(frames) // 2, len(frames) - 100)
+            frames[break_point:break_point+100] = 0
 
-    class AmbientNeuroMode(BaseAudioMode):
-        def __init__(self, audio_engine):
-            super().__init__(audio_engine)
+    class AmbientNeuroMode(GraphAudioMode):
+        MAX_POLYPHONY = 6
+        STEAL_POLICY = None  # Each tone lasts duration + 1.5 s
+        SUBDIVISION = 1
+        SECONDS = 1.5
 
-        def generate_sound(self, **kwargs):
-            """Generate an ambient neuro-inspired tone based on visualization factors."""
+        def build_graph(self):
+            """An ambient neuro-inspired tone based on visualization factors.
 
-            zoom_level = kwargs.get('zoom_level', self.DEFAULTS['zoom_level'])  # Replace default_value with a suitable default
-            rotation_angle = kwargs.get('rotation_angle', self.DEFAULTS['rotation_angle'])
-            color_intensity = kwargs.get('color_intensity', self.DEFAULTS['color_intensity'])
-
-            t = np.linspace(0, self.audio_engine.duration + 1.5, int(self.audio_engine.sample_rate * (self.audio_engine.duration + 1.5)), False)
+            The binaural pair is rendered straight into separate channels instead of being averaged to mono.
+            """
 
             # Base frequency influenced by zoom level and rotation angle
-            base_frequency = 110.0 + 55.0 * zoom_level + rotation_angle
-
-            # Binaural beat effect
-            binaural_offset = 5.0  # 5 Hz binaural beat for relaxation
-            left_ear_tone = np.sin(2 * np.pi * base_frequency * t)
-            right_ear_tone = np.sin(2 * np.pi * (base_frequency + binaural_offset) * t)
-            binaural_tone = (left_ear_tone + right_ear_tone) / 2.0
+            def base_frequency(p):
+                return 110.0 + 55.0 * p['zoom_level'] + p['rotation_angle']
 
-            # Ambient chord texture
-            sus2_harmonic = np.sin(2 * np.pi * 2 * base_frequency * t)
-            sus4_harmonic = np.sin(2 * np.pi * 4/3 * base_frequency * t)
-            chord_texture = 0.5 * sus2_harmonic + 0.5 * sus4_harmonic
+            # The sus2/sus4 chord texture and random ambient textures, heard in both ears
+            common = Mix(
+                Partials(self.partial_bank(), lambda p: base_frequency(p) * np.array([2, 4/3]), [0.5, 0.5]),
+                Noise('smooth', lambda p: 0.1 + 0.2 * p['color_intensity']))
 
-            # Random ambient textures
-            random_texture = np.interp(t, np.linspace(0, self.audio_engine.duration, 10), np.random.uniform(-1, 1, 10))
-            random_texture = random_texture * (0.1 + 0.2 * color_intensity)
-
-            # Combine all elements
-            combined_tone = binaural_tone + chord_texture + random_texture
+            # Binaural beat effect: left ear tone, right ear tone
+            binaural_offset = 5.0  # 5 Hz binaural beat for relaxation
+            left = Oscillator(base_frequency)
+            right = Oscillator(lambda p: base_frequency(p) + binaural_offset)
 
             # Apply a slow attack and release envelope
-            envelope = np.ones_like(combined_tone)
-            envelope[:100] = np.linspace(0, 1, 100)
-            envelope[-100:] = np.linspace(1, 0, 100)
-            combined_tone_with_envelope = combined_tone * envelope
-
-            # envelope = np.ones(int(self.audio_engine.sample_rate * self.audio_engine.duration))
-            # attack_duration = int(0.5 * self.audio_engine.sample_rate)  # 0.5 seconds
-            # release_duration = int(1 * self.audio_engine.sample_rate)  # 1 second
-            # envelope[:attack_duration] = np.linspace(0, 1, attack_duration)
-            # envelope[-release_duration:] = np.linspace(1, 0, release_duration)
-            # ambient_neuro_tone = combined_tone * envelope
-
-            # return ambient_neuro_tone
-            # return combined_tone
+            return Envelope(Mix(left, common), 100), Envelope(Mix(right, common), 100)
 
-            return combined_tone_with_envelope
+    class EtherealAmbientMode(GraphAudioMode):
+        DRONE_FREQUENCY = 40.0
+        DRONE_BANDWIDTH = 7 * DRONE_FREQUENCY  # Highest overtone
+        BED_SECONDS = 20.0  # Whole periods of the 4 s breathing and 10 s swell, so the bed loops exactly
 
-    class EtherealAmbientMode(BaseAudioMode):
         def __init__(self, audio_engine):
+            # The bed is synthesized at a reduced rate, so the overtone bank runs at that rate too
+            sample_rate = audio_engine.sample_rate
+            self.bed_rate = sample_rate / decimation_factor(self.DRONE_BANDWIDTH, sample_rate)
+            # The 1st, 4th and 7th harmonics of the drone, read from one precomputed table
+            self.overtones = OscillatorBank(self.bed_rate,
+                                            harmonic_stack_table(self.bed_rate, ((1, 1.0), (4, 1.0), (7, 1.0))))
+            self.loop_player = LoopPlayer(audio_engine.loops.crossfade)
             super().__init__(audio_engine)
 
-        def generate_sound(self, **kwargs):
-            """Generate a multi-layered, minimalistic, and calming tone."""
-
-            zoom_level = kwargs.get('zoom_level', self.DEFAULTS['zoom_level'])  # Replace default_value with a suitable default
-
-            t = np.linspace(0, self.audio_engine.duration, int(self.audio_engine.sample_rate * self.audio_engine.duration), False)
+        def render_drone_bed(self, num_samples):
+            """The drone and its harmonic overtones, which don't depend on any visual parameter."""
+            return render_multirate(self.drone_bed, 0.0, num_samples, self.audio_engine.sample_rate, self.DRONE_BANDWIDTH)
 
+        def drone_bed(self, t):
             # Dynamic Drone Layer with breathing effect
-            drone_frequency = 40.0
             breathing_effect = 0.1 * np.sin(0.5 * np.pi * t)
-            drone = (0.2 + breathing_effect) * np.sin(2 * np.pi * drone_frequency * t)
-
-            # Melodic Layer with occasional random pitches
-            melodic_frequency = drone_frequency * (1 + zoom_level)
-            if np.random.rand() < 0.1:
-                melodic_frequency += np.random.uniform(-5, 5)
-            melodic = 0.1 * np.sin(2 * np.pi * melodic_frequency * t)
-
-            # Echo Effect for Melodic Layer
-            delay = int(0.5 * self.audio_engine.sample_rate)
-            echo = np.roll(melodic, delay) * 0.6
-            melodic += echo
+            drone = (0.2 + breathing_effect) * np.sin(2 * np.pi * self.DRONE_FREQUENCY * t)
 
             # Harmonic Overtones with swelling effect
-            harmonics = [drone_frequency * (i*3+1) for i in range(3)]
             swell_effect = 0.05 * np.sin(0.2 * np.pi * t)
-            harmonic_tones = sum([(0.05 + swell_effect) * np.sin(2 * np.pi * freq * t) for freq in harmonics])
+            self.overtones.set_partials([self.DRONE_FREQUENCY])
+            self.overtones.phases[:] = (self.DRONE_FREQUENCY * t[0]) % 1.0  # In step with t, which starts before 0
+            harmonic_tones = (0.05 + swell_effect) * self.overtones.render(len(t))
 
-            # Random Ambient Textures
-            random_texture = np.interp(t, np.linspace(0, self.audio_engine.duration, 10), np.random.uniform(-0.05, 0.05, 10))
+            return drone + harmonic_tones
 
-            # Ambient Noise
-            noise_intensity = 0.01
-            white_noise = noise_intensity * np.random.randn(len(t))
+        def read_drone_bed(self, num_samples):
+            loop = self.audio_engine.loops.loop('EtherealAmbientMode.drone_bed', self.render_drone_bed, self.BED_SECONDS)
+            return self.loop_player.read(loop, num_samples)
 
-            # Combine all layers
-            combined_tone = drone + melodic + harmonic_tones + random_texture + white_noise
+        def melodic_frequency(self, parameters):
+            melodic_frequency = self.DRONE_FREQUENCY * (1 + parameters['zoom_level'])
+            shape = np.shape(melodic_frequency)  # A column of rows when batching
+            detuned = np.random.rand(*shape) < 0.1
+            if np.any(detuned):
+                melodic_frequency = melodic_frequency + np.where(detuned, np.random.uniform(-5, 5, shape), 0.0)
+            return melodic_frequency
 
-            # Apply an envelope for smoothness
-            envelope = np.ones_like(combined_tone)
-            envelope[:1000] = np.linspace(0, 1, 1000)
-            envelope[-1000:] = np.linspace(1, 0, 1000)
-            ethereal_tone_with_envelope = combined_tone * envelope
+        def build_graph(self):
+            """A multi-layered, minimalistic, and calming tone."""
 
-            return ethereal_tone_with_envelope
-    class MysticalForestMode(BaseAudioMode):
-        def __init__(self, audio_engine):
-            super().__init__(audio_engine)
+            # Drone and harmonic overtones never change, so they stream from one baked loop
+            drone_bed = Signal(self.read_drone_bed)
 
-        def generate_sound(self, **kwargs):
-            """Generate a mellow and vibey forest ambiance based on visual parameters."""
+            # Melodic Layer with occasional random pitches
+            melodic = Oscillator(self.melodic_frequency, 0.1)
 
-            zoom_level = kwargs.get('zoom_level', self.DEFAULTS['zoom_level'])  # Replace default_value with a suitable default
-            rotation_angle = kwargs.get('rotation_angle', self.DEFAULTS['rotation_angle'])
-            color_intensity = kwargs.get('color_intensity', self.DEFAULTS['color_intensity'])
-            pattern_density = kwargs.get('pattern_density', self.DEFAULTS['pattern_density'])
+            # Echo Effect for Melodic Layer
+            echo = Gain(Delay(melodic, 0.5), 0.6)
+
+            # Random Ambient Textures
+            random_texture = Noise('smooth', 0.05)
 
-            t = np.linspace(0, self.audio_engine.duration, int(self.audio_engine.sample_rate * self.audio_engine.duration), False)
+            # Ambient Noise
+            noise_intensity = 0.01
+            white_noise = Noise('white', noise_intensity, self.audio_engine.noise)
+
+            # Combine all layers and apply an envelope for smoothness
+            return Envelope(Mix(drone_bed, melodic, echo, random_texture, white_noise), 1000)
+
+    class MysticalForestMode(LayeredAudioMode):
+        """A mellow and vibey forest ambiance based on visual parameters."""
+        LAYERS = {
+            'bird_chirp': ('zoom_level',),  # Gentle Bird Chirps influenced by zoom_level
+            'leaf_rustle': ('color_intensity',),  # Soft Rustling Leaves influenced by color_intensity
+            'water_stream': (),  # Distant Water Stream
+            'wind_gust': ('rotation_angle',),  # Gentle Wind Gusts influenced by rotation_angle
+            'owl_hoot': ('pattern_density',),  # Occasional Distant Owl Hoot influenced by pattern_density
+        }
+        STOCHASTIC_LAYERS = ('leaf_rustle',)
+        BANDWIDTHS = {'water_stream': 40.0, 'wind_gust': 1.0, 'owl_hoot': 400.0}
 
-            # Gentle Bird Chirps influenced by zoom_level
+        def layer_bird_chirp(self, t, zoom_level):
             chirp_frequency = 1000.0 + 50.0 * np.sin(0.1 * np.pi * t)
-            bird_chirp = (0.02 + 0.01 * zoom_level) * np.sin(2 * np.pi * chirp_frequency * t)
+            return (0.02 + 0.01 * zoom_level) * np.sin(2 * np.pi * chirp_frequency * t)
 
-            # Soft Rustling Leaves influenced by color_intensity
+        def layer_leaf_rustle(self, t, color_intensity):
             rustle_intensity = 0.01 + 0.005 * color_intensity
-            leaf_rustle = rustle_intensity * np.random.randn(len(t))
+            return rustle_intensity * self.audio_engine.noise.block('white', len(t))
 
-            # Distant Water Stream
+        def layer_water_stream(self, t):
             stream_frequency = 40.0
-            water_stream = 0.02 * np.sin(2 * np.pi * stream_frequency * t)
+            return 0.02 * np.sin(2 * np.pi * stream_frequency * t)
 
-            # Gentle Wind Gusts influenced by rotation_angle
-            wind_gust = (0.01 + 0.005 * rotation_angle) * np.sin(0.05 * np.pi * t)
+        def layer_wind_gust(self, t, rotation_angle):
+            return (0.01 + 0.005 * rotation_angle) * np.sin(0.05 * np.pi * t)
 
-            # Occasional Distant Owl Hoot influenced by pattern_density
+        def layer_owl_hoot(self, t, pattern_density):
             owl_hoot_frequency = 400.0
-            owl_hoot = (0.005 + 0.0025 * pattern_density) * np.sin(2 * np.pi * owl_hoot_frequency * t)
-
-            # Combine all layers
-            forest_ambiance = bird_chirp + leaf_rustle + water_stream + wind_gust + owl_hoot
-
-            # Apply an envelope for smoothness
-            envelope = np.ones_like(forest_ambiance)
-            envelope[:1000] = np.linspace(0, 1, 1000)
-            envelope[-1000:] = np.linspace(1, 0, 1000)
-            forest_ambiance_with_envelope = forest_ambiance * envelope
-
-            return forest_ambiance_with_envelope
-
-    class DesertNightMode(BaseAudioMode):
-        def __init__(self, audio_engine):
-            super().__init__(audio_engine)
-
-        def generate_sound(self, **kwargs):
-            """Generate a serene and mysterious desert night ambiance based on visual parameters."""
-
-            zoom_level = kwargs.get('zoom_level', self.DEFAULTS['zoom_level'])  # Replace default_value with a suitable default
-            rotation_angle = kwargs.get('rotation_angle', self.DEFAULTS['rotation_angle'])
-            color_intensity = kwargs.get('color_intensity', self.DEFAULTS['color_intensity'])
-            pattern_density = kwargs.get('pattern_density', self.DEFAULTS['pattern_density'])
-
-            t = np.linspace(0, self.audio_engine.duration, int(self.audio_engine.sample_rate * self.audio_engine.duration), False)
+            return (0.005 + 0.0025 * pattern_density) * np.sin(2 * np.pi * owl_hoot_frequency * t)
+
+    class DesertNightMode(LayeredAudioMode):
+        """A serene and mysterious desert night ambiance based on visual parameters."""
+        LAYERS = {
+            'desert_wind': ('zoom_level',),  # Distant Wind influenced by zoom_level
+            'sand_movement': ('rotation_angle',),  # Soft Sand Movements influenced by rotation_angle
+            'insect_chirp': ('color_intensity',),  # Night Insects influenced by color_intensity
+            'animal_call': ('pattern_density',),  # Distant Animal Calls influenced by pattern_density
+        }
+        LOOP_SECONDS = 2.0
+        BANDWIDTHS = {
+            'desert_wind': 1.0,
+            'sand_movement': lambda rotation_angle: 5.0 + 2.5 * abs(rotation_angle),
+            'insect_chirp': 450.0,
+            'animal_call': 300.0,
+        }
 
-            # Distant Wind influenced by zoom_level
+        def layer_desert_wind(self, t, zoom_level):
             wind_intensity = 0.01 + 0.005 * zoom_level
-            desert_wind = wind_intensity * np.sin(0.025 * np.pi * t)
+            return wind_intensity * np.sin(0.025 * np.pi * t)
 
-            # Soft Sand Movements influenced by rotation_angle
+        def layer_sand_movement(self, t, rotation_angle):
             sand_movement_frequency = 5.0 + 2.5 * rotation_angle
-            sand_movement = 0.005 * np.sin(2 * np.pi * sand_movement_frequency * t)
+            return 0.005 * np.sin(2 * np.pi * sand_movement_frequency * t)
 
-            # Night Insects influenced by color_intensity
+        def layer_insect_chirp(self, t, color_intensity):
             insect_chirp_frequency = 450.0
-            insect_chirp = (0.005 + 0.0025 * color_intensity) * np.sin(2 * np.pi * insect_chirp_frequency * t)
+            return (0.005 + 0.0025 * color_intensity) * np.sin(2 * np.pi * insect_chirp_frequency * t)
 
-            # Distant Animal Calls influenced by pattern_density
+        def layer_animal_call(self, t, pattern_density):
             animal_call_frequency = 300.0
-            animal_call = (0.0025 + 0.001 * pattern_density) * np.sin(2 * np.pi * animal_call_frequency * t)
-
-            # Combine all layers
-            desert_ambiance = desert_wind + sand_movement + insect_chirp + animal_call
-
-            # Apply an envelope for smoothness
-            envelope = np.ones_like(desert_ambiance)
-            envelope[:1000] = np.linspace(0, 1, 1000)
-            envelope[-1000:] = np.linspace(1, 0, 1000)
-            desert_ambiance_with_envelope = desert_ambiance * envelope
-
-            return desert_ambiance_with_envelope
-
-    class AlienPlanetMode(BaseAudioMode):
-        def __init__(self, audio_engine):
-            super().__init__(audio_engine)
-
-        def generate_sound(self, **kwargs):
-            """Generate a mellow and mysterious alien planet ambiance based on visual parameters."""
-
-            zoom_level = kwargs.get('zoom_level', self.DEFAULTS['zoom_level'])  # Replace default_value with a suitable default
-            rotation_angle = kwargs.get('rotation_angle', self.DEFAULTS['rotation_angle'])
-            color_intensity = kwargs.get('color_intensity', self.DEFAULTS['color_intensity'])
-            pattern_density = kwargs.get('pattern_density', self.DEFAULTS['pattern_density'])
-
-            t = np.linspace(0, self.audio_engine.duration, int(self.audio_engine.sample_rate * self.audio_engine.duration), False)
+            return (0.0025 + 0.001 * pattern_density) * np.sin(2 * np.pi * animal_call_frequency * t)
+
+    class AlienPlanetMode(LayeredAudioMode):
+        """A mellow and mysterious alien planet ambiance based on visual parameters."""
+        LAYERS = {
+            'alien_atmosphere': ('zoom_level',),  # Alien Atmosphere influenced by zoom_level
+            'mysterious_echo': ('rotation_angle',),  # Mysterious Echoes influenced by rotation_angle
+            'alien_flora': ('color_intensity',),  # Gentle Alien Flora influenced by color_intensity
+            'alien_call': ('pattern_density',),  # Distant Alien Calls influenced by pattern_density
+        }
+        LOOP_SECONDS = 2.0
+        BANDWIDTHS = {
+            'alien_atmosphere': lambda zoom_level: 40.0 + 10.0 * abs(zoom_level),
+            'mysterious_echo': lambda rotation_angle: 5.0 + 2.5 * abs(rotation_angle),
+            'alien_flora': 450.0,
+            'alien_call': 300.0,
+        }
 
-            # Alien Atmosphere influenced by zoom_level
+        def layer_alien_atmosphere(self, t, zoom_level):
             atmosphere_depth = 40.0 + 10.0 * zoom_level
-            alien_atmosphere = 0.02 * np.sin(2 * np.pi * atmosphere_depth * t)
+            return 0.02 * np.sin(2 * np.pi * atmosphere_depth * t)
 
-            # Mysterious Echoes influenced by rotation_angle
+        def layer_mysterious_echo(self, t, rotation_angle):
             echo_frequency = 5.0 + 2.5 * rotation_angle
-            mysterious_echo = 0.005 * np.sin(2 * np.pi * echo_frequency * t)
+            return 0.005 * np.sin(2 * np.pi * echo_frequency * t)
 
-            # Gentle Alien Flora influenced by color_intensity
+        def layer_alien_flora(self, t, color_intensity):
             flora_rustle_frequency = 450.0
-            alien_flora = (0.005 + 0.0025 * color_intensity) * np.sin(2 * np.pi * flora_rustle_frequency * t)
+            return (0.005 + 0.0025 * color_intensity) * np.sin(2 * np.pi * flora_rustle_frequency * t)
 
-            # Distant Alien Calls influenced by pattern_density
+        def layer_alien_call(self, t, pattern_density):
             alien_call_frequency = 300.0
-            alien_call = (0.0025 + 0.001 * pattern_density) * np.sin(2 * np.pi * alien_call_frequency * t)
-
-            # Combine all layers
-            alien_ambiance = alien_atmosphere + mysterious_echo + alien_flora + alien_call
-
-            # Apply an envelope for smoothness
-            envelope = np.ones_like(alien_ambiance)
-            envelope[:1000] = np.linspace(0, 1, 1000)
-            envelope[-1000:] = np.linspace(1, 0, 1000)
-            alien_ambiance_with_envelope = alien_ambiance * envelope
+            return (0.0025 + 0.001 * pattern_density) * np.sin(2 * np.pi * alien_call_frequency * t)
 
-            return alien_ambiance_with_envelope
-    class RainSoundMode(BaseAudioMode):
+    class RainSoundMode(GraphAudioMode):
         def __init__(self, audio_engine):
             super().__init__(audio_engine)
             self.melody_direction = 1  # 1 for ascending, -1 for descending
             self.musical_intervals = [1, 4, 5, 8]  # Unison, Perfect Fourth, Perfect Fifth, Octave
 
-        def generate_rain_sound(self, zoom_level, rotation_angle):
-            """Generate a mellow rain sound effect with occasional bursts of intensity."""
-            t = np.linspace(0, self.audio_engine.duration, int(self.audio_engine.sample_rate * self.audio_engine.duration), False)
+        def rain_sound(self):
+            """A mellow rain sound effect with occasional bursts of intensity."""
 
-            # Base rain sound (white noise) with further reduced amplitude
-            rain_sound = 0.1 * np.random.randn(len(t))
-
-            # Use a sine wave for cyclic fading
-            fade_frequency = 0.5 + 0.1 * zoom_level
-            fade_amplitude = 0.4 + 0.1 * np.sin(2 * np.pi * rotation_angle)
-            fade_effect = fade_amplitude * np.sin(2 * np.pi * fade_frequency * t)
-
-            # Map the fade_effect from [-1, 1] to [0, 1]
-            fade_effect = 0.5 * (fade_effect + 1)
-
-            # Apply the fade effect to the rain sound
-            rain_sound_adjusted = rain_sound * fade_effect
+            # Use a sine wave for cyclic fading, mapped from [-1, 1] to [0, 1],
+            # of a white noise base with further reduced amplitude
+            def fade_amplitude(p):
+                return 0.1 * 0.5 * (0.4 + 0.1 * np.sin(2 * np.pi * p['rotation_angle']))
+            fade_effect = LFO(lambda p: 0.5 + 0.1 * p['zoom_level'], depth=fade_amplitude, offset=0.1 * 0.5)
+            rain_sound = Noise('white', fade_effect, self.audio_engine.noise)
 
             # More subtle bursts of intensity
-            intensity_factor = np.random.rand()
-            if intensity_factor > 0.97:  # 3% chance to introduce a burst of intensity
-                burst_intensity = 0.8 + 0.2 * zoom_level
-                rain_sound_adjusted *= burst_intensity
-
-            return rain_sound_adjusted
+            def burst(p):
+                intensity_factor = np.random.rand(*np.shape(p['zoom_level']))  # One draw per row when batching
+                # 3% chance to introduce a burst of intensity
+                return np.where(intensity_factor > 0.97, 0.8 + 0.2 * p['zoom_level'], 1.0)
+            return Gain(rain_sound, burst)
 
-        def generate_melodic_tone(self, zoom_level, rotation_angle):
-            """Generate a melodic tone that changes based on visual parameters."""
-            t = np.linspace(0, self.audio_engine.duration, int(self.audio_engine.sample_rate * self.audio_engine.duration), False)
+        def melodic_tone(self):
+            """A melodic tone that changes based on visual parameters."""
 
-            # Base frequency influenced by zoom_level
-            frequency = 220 + 20 * (zoom_level - 0.5)
-
-            # Modulate the frequency using rotation_angle for variation
-            frequency_modulation = 10 * np.sin(2 * np.pi * 0.5 * rotation_angle * t)
-
-            # Generate the tone
-            tone = 0.3 * np.sin(2 * np.pi * (frequency + frequency_modulation) * t)
-
-            # Apply an envelope for smoothness
-            envelope = np.ones_like(tone)
-            envelope[:1000] = np.linspace(0, 1, 1000)
-            envelope[-1000:] = np.linspace(1, 0, 1000)
-            tone_with_envelope = tone * envelope
+            # Base frequency influenced by zoom_level, modulated using rotation_angle for variation
+            frequency = LFO(lambda p: 0.5 * p['rotation_angle'], depth=10,
+                            offset=lambda p: 220 + 20 * (p['zoom_level'] - 0.5))
 
-            return tone_with_envelope
+            # Generate the tone and apply an envelope for smoothness
+            return Envelope(Oscillator(frequency, 0.3), 1000)
 
-        def generate_rhythmic_element(self, pattern_density):
-            """Generate a subtle rhythmic element based on pattern_density."""
-            t = np.linspace(0, self.audio_engine.duration, int(self.audio_engine.sample_rate * self.audio_engine.duration), False)
+        def rhythmic_element(self):
+            """A subtle rhythmic element based on pattern_density."""
 
             # Base rhythm frequency influenced by pattern_density
-            rhythm_frequency = 2 + 0.5 * pattern_density
-
-            # Generate the rhythm
-            rhythm = 0.2 * np.sin(2 * np.pi * rhythm_frequency * t)
-
-            return rhythm
-
-        def generate_sound(self, **kwargs):
-
-            zoom_level = kwargs.get('zoom_level', self.DEFAULTS['zoom_level'])
-            rotation_angle = kwargs.get('rotation_angle', self.DEFAULTS['rotation_angle'])
-            pattern_density = kwargs.get('pattern_density', self.DEFAULTS['pattern_density'])
-
-            """Generate the combined sound of rain, melodic tones, and rhythmic elements."""
-            rain_sound = self.generate_rain_sound(zoom_level, rotation_angle)
-            melodic_tone = self.generate_melodic_tone(zoom_level, rotation_angle)
-            rhythmic_element = self.generate_rhythmic_element(pattern_density)
-
-            # Combine all sound layers
-            combined_sound = rain_sound + melodic_tone + rhythmic_element
+            return Oscillator(lambda p: 2 + 0.5 * p['pattern_density'], 0.2)
 
-            return combined_sound
+        def build_graph(self):
+            """The combined sound of rain, melodic tones, and rhythmic elements."""
+            return Mix(self.rain_sound(), self.melodic_tone(), self.rhythmic_element())
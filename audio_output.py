@@ -0,0 +1,149 @@
+import numpy as np
+
+try:
+    import sounddevice as sd
+except (ImportError, OSError):  # sounddevice missing or PortAudio not installed
+    sd = None
+
+
+class RingBuffer:
+    """Preallocated single-producer/single-consumer ring buffer of float32 frames.
+
+    The synthesis side only advances write_index and the audio callback only
+    advances read_index, so the two sides never need a lock. The frames and the
+    indices can be handed in as views of shared memory to cross processes.
+    """
+    WRITE_INDEX, READ_INDEX, UNDERRUNS, OVERRUNS = range(4)
+    STATE_SIZE = 4
+
+    def __init__(self, capacity, channels=2, buffer=None, state=None):
+        self.capacity = capacity
+        self.channels = channels
+        self.buffer = np.zeros((capacity, channels), dtype=np.float32) if buffer is None else buffer
+        self.state = np.zeros(self.STATE_SIZE, dtype=np.int64) if state is None else state
+
+    @property
+    def write_index(self):
+        """Total frames ever written."""
+        return int(self.state[self.WRITE_INDEX])
+
+    @write_index.setter
+    def write_index(self, value):
+        self.state[self.WRITE_INDEX] = value
+
+    @property
+    def read_index(self):
+        """Total frames ever read."""
+        return int(self.state[self.READ_INDEX])
+
+    @read_index.setter
+    def read_index(self, value):
+        self.state[self.READ_INDEX] = value
+
+    @property
+    def underruns(self):
+        """Reads that had to be padded with silence."""
+        return int(self.state[self.UNDERRUNS])
+
+    @underruns.setter
+    def underruns(self, value):
+        self.state[self.UNDERRUNS] = value
+
+    @property
+    def overruns(self):
+        """Writes that had to drop frames."""
+        return int(self.state[self.OVERRUNS])
+
+    @overruns.setter
+    def overruns(self, value):
+        self.state[self.OVERRUNS] = value
+
+    def available(self):
+        """Frames written but not read yet."""
+        return self.write_index - self.read_index
+
+    def free(self):
+        return self.capacity - self.available()
+
+    def write(self, frames):
+        """Copy mono (n,) or (n, channels) frames in, dropping whatever does not fit."""
+        if frames.ndim == 1:
+            frames = frames[:, None]  # Broadcast mono to every channel
+        count = min(len(frames), self.free())
+        if count < len(frames):
+            self.overruns += 1
+
+        start = self.write_index % self.capacity
+        first = min(count, self.capacity - start)
+        self.buffer[start:start + first] = frames[:first]
+        self.buffer[:count - first] = frames[first:count]
+        self.write_index += count
+        return count
+
+    def read_into(self, out):
+        """Fill out with the oldest frames, padding with silence on underrun."""
+        count = min(len(out), self.available())
+        start = self.read_index % self.capacity
+        first = min(count, self.capacity - start)
+        out[:first] = self.buffer[start:start + first]
+        out[first:count] = self.buffer[:count - first]
+        if count < len(out):
+            out[count:] = 0
+            self.underruns += 1
+        self.read_index += count
+        return count
+
+
+class RingOutput:
+    """The synthesis side of a RingBuffer: keeps it topped up to a target fill."""
+
+    def __init__(self, ring, target_frames, sample_rate=44100):
+        self.ring = ring
+        self.target_frames = target_frames  # Frames kept queued ahead of the reader; bounds latency
+        self.sample_rate = sample_rate
+
+    def frames_needed(self):
+        """Frames the synthesis side should write to bring the buffer back to its target fill."""
+        return max(0, self.target_frames - self.ring.available())
+
+    def write(self, frames):
+        return self.ring.write(frames)
+
+    def latency(self):
+        """Seconds of audio queued ahead of the reader."""
+        return self.ring.available() / self.sample_rate
+
+    def close(self):
+        pass
+
+
+class SoundDeviceOutput(RingOutput):
+    """Continuous sounddevice output stream whose callback drains a RingBuffer."""
+
+    def __init__(self, sample_rate=44100, channels=2, block_size=512, latency=0.1, ring=None):
+        if sd is None:
+            raise RuntimeError("sounddevice is not available")
+        target_frames = max(block_size, int(latency * sample_rate))
+        if ring is None:
+            ring = RingBuffer(2 * target_frames, channels)
+        super().__init__(ring, target_frames, sample_rate)
+        self.block_size = block_size
+        self.device_underflows = 0
+        self.stream = sd.OutputStream(samplerate=sample_rate, channels=channels, dtype='float32',
+                                      blocksize=block_size, callback=self._callback)
+
+    def _callback(self, outdata, frames, time, status):
+        if status.output_underflow:
+            self.device_underflows += 1
+        self.ring.read_into(outdata)
+
+    def start(self):
+        self.stream.start()
+
+    def close(self):
+        self.stream.stop()
+        self.stream.close()
+
+    def latency(self):
+        """Current output latency in seconds: queued frames plus the device's own latency."""
+        return super().latency() + self.stream.latency
@@ -0,0 +1,201 @@
+import multiprocessing
+import time
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from analysis import SpectrumAnalyzer
+from audio_engine import AudioEngine
+from audio_output import RingBuffer, RingOutput, SoundDeviceOutput
+from grains import EVENT_FIELDS, EventChannel
+from midi_output import open_midi
+from spatial import SourceVoices
+
+# Layout of the float64 control block the render loop writes and the worker reads
+PARAMETER_KEYS = ('zoom_level', 'rotation_angle', 'color_intensity', 'pattern_density', 'pan_x', 'pan_y')
+MODE, VOLUME, MUTED, RUNNING, NUM_SOURCES = range(len(PARAMETER_KEYS), len(PARAMETER_KEYS) + 5)
+CONTROL_SIZE = NUM_SOURCES + 1
+
+CHANNELS = 2
+EVENT_CAPACITY = 1024
+SOURCE_CAPACITY = SourceVoices.MAX_SOURCES
+SOURCE_FIELDS = 3  # x, y, level
+
+
+def _segment_size(capacity):
+    return (CONTROL_SIZE * 8 + SpectrumAnalyzer.VALUES_SIZE * 8 + 2 * RingBuffer.STATE_SIZE * 8
+            + capacity * CHANNELS * 4 + EVENT_CAPACITY * EVENT_FIELDS * 4 + SOURCE_CAPACITY * SOURCE_FIELDS * 4)
+
+
+def _views(memory, capacity):
+    """Control block, analysis, both rings' state, visual events, sources and PCM frames back to back in one shared segment."""
+    control = np.ndarray((CONTROL_SIZE,), dtype=np.float64, buffer=memory.buf)
+    offset = CONTROL_SIZE * 8
+    analysis = np.ndarray((SpectrumAnalyzer.VALUES_SIZE,), dtype=np.float64, buffer=memory.buf, offset=offset)
+    offset += SpectrumAnalyzer.VALUES_SIZE * 8
+    state = np.ndarray((RingBuffer.STATE_SIZE,), dtype=np.int64, buffer=memory.buf, offset=offset)
+    offset += RingBuffer.STATE_SIZE * 8
+    event_state = np.ndarray((RingBuffer.STATE_SIZE,), dtype=np.int64, buffer=memory.buf, offset=offset)
+    offset += RingBuffer.STATE_SIZE * 8
+    events = np.ndarray((EVENT_CAPACITY, EVENT_FIELDS), dtype=np.float32, buffer=memory.buf, offset=offset)
+    offset += EVENT_CAPACITY * EVENT_FIELDS * 4
+    sources = np.ndarray((SOURCE_CAPACITY, SOURCE_FIELDS), dtype=np.float32, buffer=memory.buf, offset=offset)
+    offset += SOURCE_CAPACITY * SOURCE_FIELDS * 4
+    pcm = np.ndarray((capacity, CHANNELS), dtype=np.float32, buffer=memory.buf, offset=offset)
+    return control, state, pcm, event_state, events, sources, analysis
+
+
+def _run_worker(segment_name, capacity, sample_rate, target_frames, reverb, track, record, midi):
+    """Worker process: run an AudioEngine that streams into the shared ring buffer."""
+    memory = shared_memory.SharedMemory(name=segment_name)
+    control, state, pcm, event_state, events, sources, analysis = _views(memory, capacity)
+    ring = RingBuffer(capacity, CHANNELS, buffer=pcm, state=state)
+
+    engine = AudioEngine(sample_rate, backend=None)
+    engine.attach_output(RingOutput(ring, target_frames, sample_rate))
+    engine.events = EventChannel(ring=RingBuffer(EVENT_CAPACITY, EVENT_FIELDS, buffer=events, state=event_state))
+    engine.analyzer = SpectrumAnalyzer(sample_rate, values=analysis)
+    if reverb:
+        engine.set_reverb(None if reverb is True else reverb)
+    if track:
+        engine.play_track(track, loop=True)
+    if record:
+        engine.start_recording(record)
+    if midi:
+        engine.attach_midi(open_midi(midi, sample_rate))
+    mode_classes = AudioEngine.mode_classes()
+    mode_index = 0
+    # Wake up a few times per target fill so the buffer never drains
+    poll_interval = target_frames / sample_rate / 4
+
+    while control[RUNNING]:
+        if int(control[MODE]) != mode_index:
+            mode_index = int(control[MODE])
+            engine.mode = mode_classes[mode_index](engine)
+        engine.muted = bool(control[MUTED])
+        engine.current_volume = float(control[VOLUME])
+        engine.set_parameters({key: float(control[i]) for i, key in enumerate(PARAMETER_KEYS)})
+        num_sources = int(control[NUM_SOURCES])
+        engine.set_sources(sources[:num_sources, :2], sources[:num_sources, 2])  # Copied, so the renderer can move on
+        engine.update()
+        time.sleep(poll_interval)
+
+    engine.close()  # Finishes the recording and MIDI file, if any
+    del control, state, pcm, ring, event_state, events, sources, analysis
+    engine.events = engine.analyzer = None
+    memory.close()
+
+
+class AudioWorker:
+    """Runs AudioEngine and its modes in a separate process, away from the render loop's GIL.
+
+    Parameters go in through a small shared-memory control block and finished PCM
+    comes back through a shared-memory RingBuffer drained by the sounddevice
+    callback, so nothing is pickled once the worker is running. Offers the subset
+    of AudioEngine's interface that main and the UI elements use.
+    """
+    CLOSE_TIMEOUT = 5.0  # Seconds the worker gets to finish its recording or MIDI file before it is killed
+
+    def __init__(self, sample_rate=44100, latency=0.1, block_size=512, current_volume=0.2, reverb=False, track=None,
+                 record=None, midi=None):
+        """reverb is False, True for the procedural hall, or the path of a WAV impulse response.
+
+        track is the path of a WAV file the worker loops in place of the modes,
+        record that of a WAV file it archives its output to, and midi a MIDI port
+        name or .mid path the composing modes' notes go to.
+        """
+        self.sample_rate = sample_rate
+        target_frames = max(block_size, int(latency * sample_rate))
+        capacity = 2 * target_frames
+        self.mode_names = [mode.__name__ for mode in AudioEngine.mode_classes()]
+
+        self._memory = shared_memory.SharedMemory(create=True, size=_segment_size(capacity))
+        self.output = self.process = None
+        try:
+            self.control, state, pcm, event_state, events, self._sources, analysis = _views(self._memory, capacity)
+            self.control[:] = 0
+            analysis[:] = 0
+            state[:] = 0
+            event_state[:] = 0
+            self.events = EventChannel(ring=RingBuffer(EVENT_CAPACITY, EVENT_FIELDS, buffer=events, state=event_state))
+            self.analyzer = SpectrumAnalyzer(sample_rate, values=analysis)  # Only read here; the worker analyzes
+            for i, key in enumerate(PARAMETER_KEYS):
+                self.control[i] = AudioEngine.BaseAudioMode.DEFAULTS[key]
+            self.control[VOLUME] = current_volume
+            self.control[RUNNING] = 1
+            self.ring = RingBuffer(capacity, CHANNELS, buffer=pcm, state=state)
+
+            self.output = SoundDeviceOutput(sample_rate, CHANNELS, block_size, latency, ring=self.ring)
+            self.process = multiprocessing.Process(target=_run_worker, daemon=True,
+                                                   args=(self._memory.name, capacity, sample_rate, target_frames, reverb, track, record, midi))
+            self.process.start()
+            self.output.start()
+        except Exception:
+            # Without PortAudio or a working device the segment would otherwise stay behind in /dev/shm
+            state = pcm = event_state = events = analysis = None
+            self._release()
+            raise
+
+    @property
+    def muted(self):
+        return bool(self.control[MUTED])
+
+    def mute(self):
+        self.control[MUTED] = 1
+
+    def unmute(self):
+        self.control[MUTED] = 0
+
+    @property
+    def current_volume(self):
+        return float(self.control[VOLUME])
+
+    def set_volume(self, volume):
+        self.control[VOLUME] = min(max(volume, 0.0), 1.0)
+
+    def set_mode(self, mode_name):
+        self.control[MODE] = self.mode_names.index(mode_name)
+
+    def set_parameters(self, audio_parameters):
+        for i, key in enumerate(PARAMETER_KEYS):
+            if key in audio_parameters:
+                self.control[i] = audio_parameters[key]
+
+    def add_events(self, events):
+        self.events.push(events)
+
+    def set_sources(self, positions, levels=None):
+        positions = np.asarray(positions).reshape(-1, 2)[:SOURCE_CAPACITY]
+        self._sources[:len(positions), :2] = positions
+        self._sources[:len(positions), 2] = 1.0 if levels is None else np.asarray(levels)[:len(positions)]
+        self.control[NUM_SOURCES] = len(positions)
+
+    def update(self):
+        pass  # The worker keeps its own time
+
+    def stats(self):
+        """Ring buffer health: underruns on the device side, overruns on the worker side."""
+        return {
+            'underruns': self.ring.underruns,
+            'overruns': self.ring.overruns,
+            'latency': self.output.latency(),
+            'dropped_events': self.events.dropped,
+        }
+
+    def close(self):
+        self.control[RUNNING] = 0
+        self.process.join(timeout=self.CLOSE_TIMEOUT)
+        self._release()
+
+    def _release(self):
+        """Stop the worker and the device, then free the shared segment."""
+        if self.process is not None and self.process.is_alive():
+            # Still writing out a recording or MIDI file; the segment can't go while it uses it
+            self.process.terminate()
+            self.process.join()
+        if self.output is not None:
+            self.output.close()
+        # Every view into the segment has to go before it can be closed
+        self.output = self.ring = self.control = self.events = self._sources = self.analyzer = None
+        self._memory.close()
+        self._memory.unlink()
@@ -0,0 +1,319 @@
+"""Micro-benchmarks for the audio synthesis building blocks.
+
+Run with `python benchmark.py [name ...]`; with no names every benchmark runs.
+"""
+import sys
+import time
+
+import numpy as np
+
+from synthesis import (OscillatorBank, SpectralBank, Wavetable, decimation_factor, harmonic_stack_table, render_multirate,
+                       saw_table)
+
+SAMPLE_RATE = 44100
+
+
+def measure(function, num_samples, repeats=50):
+    """Best-of-repeats throughput of function() in samples per second."""
+    function()  # Warm up caches and lazily built tables
+    best = float('inf')
+    for _ in range(repeats):
+        start = time.perf_counter()
+        function()
+        best = min(best, time.perf_counter() - start)
+    return num_samples / best
+
+
+def report(label, samples_per_second):
+    print(f"  {label:<44} {samples_per_second / 1e6:8.2f} M samples/s")
+
+
+def bench_wavetable():
+    print("wavetable")
+    for duration in (0.1, 1.6):
+        num_samples = int(SAMPLE_RATE * duration)
+        t = np.linspace(0, duration, num_samples, False)
+        print(f" {num_samples} samples")
+
+        # EtherealAmbientMode harmonic overtones: three np.sin layers vs one stacked table
+        harmonics = [40.0 * (i*3+1) for i in range(3)]
+        stack = OscillatorBank(SAMPLE_RATE, harmonic_stack_table(SAMPLE_RATE, ((1, 1.0), (4, 1.0), (7, 1.0))))
+        stack.set_partials([40.0])
+        report("ethereal overtones, per-layer np.sin",
+               measure(lambda: sum([np.sin(2 * np.pi * freq * t) for freq in harmonics]), num_samples))
+        report("ethereal overtones, harmonic stack table", measure(lambda: stack.render(num_samples), num_samples))
+
+        # DefaultAudioMode chord sum: one np.sin per chord note vs a batched bank
+        chord = [261.63, 329.63, 392.0]
+        sines = OscillatorBank(SAMPLE_RATE)
+        sines.set_partials(chord)
+        table = OscillatorBank(SAMPLE_RATE, Wavetable([(1, 1.0)], SAMPLE_RATE))
+        table.set_partials(chord)
+        report("chord, per-note np.sin",
+               measure(lambda: sum([np.sin(freq * t * 2 * np.pi) for freq in chord]), num_samples))
+        report("chord, OscillatorBank np.sin", measure(lambda: sines.render(num_samples), num_samples))
+        report("chord, OscillatorBank sine table", measure(lambda: table.render(num_samples), num_samples))
+
+        # Band-limited saw at 110 Hz: additive sines up to Nyquist vs one table lookup
+        partials = np.arange(1, int(SAMPLE_RATE / 2 / 110) + 1)
+        saw = OscillatorBank(SAMPLE_RATE, saw_table(SAMPLE_RATE))
+        saw.set_partials([110.0])
+        report(f"saw, {len(partials)} additive np.sin partials",
+               measure(lambda: sum([np.sin(2 * np.pi * 110.0 * n * t) / n for n in partials]), num_samples, repeats=3))
+        report("saw, band-limited table", measure(lambda: saw.render(num_samples), num_samples))
+
+
+def bench_noise():
+    from audio_engine import NoiseBank
+
+    print("noise")
+    bank = NoiseBank(seed=0)
+    rng = np.random.default_rng(0)
+    for duration in (0.1, 2.0):
+        num_samples = int(SAMPLE_RATE * duration)
+        print(f" {num_samples} samples")
+        report("np.random.randn per call", measure(lambda: np.random.randn(num_samples), num_samples))
+        report("Generator.standard_normal per call", measure(lambda: rng.standard_normal(num_samples), num_samples))
+        for kind in NoiseBank.KINDS:
+            report(f"NoiseBank {kind} view", measure(lambda: bank.block(kind, num_samples), num_samples))
+        # What the modes actually do with a block: scale it
+        report("0.1 * np.random.randn", measure(lambda: 0.1 * np.random.randn(num_samples), num_samples))
+        report("0.1 * NoiseBank white", measure(lambda: 0.1 * bank.block('white', num_samples), num_samples))
+
+
+def bench_graph():
+    from dsp_graph import LFO, Envelope, Gain, Graph, Mix, Oscillator
+
+    print("graph")
+    for duration in (0.1, 1.6):
+        num_samples = int(SAMPLE_RATE * duration)
+        t = np.linspace(0, duration, num_samples, False)
+        print(f" {num_samples} samples")
+
+        # PulsatingAudioMode's chain: hand-written with a temporary per step vs a pooled graph
+        def by_hand():
+            modulator = 0.85 * (1.0 + np.sin(2 * np.pi * 11.0 * t))
+            tone = np.sin(2 * np.pi * 374.0 * t) + 0.3 * np.sin(2 * np.pi * 748.0 * t) + 0.12 * np.sin(2 * np.pi * 1122.0 * t)
+            envelope = np.ones(num_samples)
+            envelope[:100] = np.linspace(0, 1, 100)
+            envelope[-100:] = np.linspace(1, 0, 100)
+            return tone * modulator * envelope
+
+        tone = Mix(Oscillator(374.0), Oscillator(748.0, 0.3), Oscillator(1122.0, 0.12))
+        graph = Graph([Envelope(Gain(tone, LFO(11.0, 0.85, 0.85)), 100)], SAMPLE_RATE, num_samples)
+        report("pulsating chain, np temporaries", measure(by_hand, num_samples))
+        report(f"pulsating chain, graph ({graph.num_slots} pooled buffers)",
+               measure(lambda: graph.render(num_samples), num_samples))
+
+
+def bench_effects():
+    from effects import Biquad, Chorus, DelayLine
+
+    print("effects")
+    rng = np.random.default_rng(0)
+    for duration in (0.01, 0.1):
+        num_samples = int(SAMPLE_RATE * duration)
+        block = rng.standard_normal(num_samples)
+        out = np.empty(num_samples)
+        print(f" {num_samples} samples")
+
+        # Biquad lowpass: transposed direct form II one sample at a time vs chunked state-space
+        biquad = Biquad(1000.0, SAMPLE_RATE)
+        b, a = biquad._coefficients(1000.0)
+        b0, b1, b2 = np.array(b) / a[0]
+        a1, a2 = a[1] / a[0], a[2] / a[0]
+
+        def per_sample():
+            z1 = z2 = 0.0
+            for n, x in enumerate(block):
+                y = b0 * x + z1
+                z1 = b1 * x - a1 * y + z2
+                z2 = b2 * x - a2 * y
+                out[n] = y
+
+        report("biquad, per-sample loop", measure(per_sample, num_samples, repeats=5))
+        report("biquad, chunked state-space", measure(lambda: biquad.process(block, out), num_samples))
+
+        delay = DelayLine(int(0.5 * SAMPLE_RATE))
+        report("feedback delay line, 0.5 s", measure(lambda: delay.process(block, len(delay.buffer), 0.5, out), num_samples))
+        chorus = Chorus(SAMPLE_RATE)
+        report("chorus, 3 voices", measure(lambda: chorus.process(block, out), num_samples))
+
+
+def bench_additive():
+    print("additive")
+    rng = np.random.default_rng(0)
+    num_samples = int(SAMPLE_RATE * 0.1)
+    print(f" {num_samples} samples")
+    for num_partials in (10, 50, 200):
+        frequencies = rng.uniform(50, 8000, num_partials)
+        amplitudes = np.full(num_partials, 1 / num_partials)
+        sines = OscillatorBank(SAMPLE_RATE)
+        sines.set_partials(frequencies, amplitudes)
+        spectral = SpectralBank(SAMPLE_RATE)
+        spectral.set_partials(frequencies, amplitudes)
+        report(f"{num_partials} partials, OscillatorBank np.sin", measure(lambda: sines.render(num_samples), num_samples))
+        report(f"{num_partials} partials, SpectralBank inverse FFT", measure(lambda: spectral.render(num_samples), num_samples))
+
+
+def bench_reverb():
+    from reverb import ConvolutionReverb
+
+    print("reverb")
+    rng = np.random.default_rng(0)
+    block_size = ConvolutionReverb.BLOCK_SIZE
+    block = np.zeros((block_size, 2), dtype=np.float32)
+    print(f" {block_size}-frame stereo blocks, {SAMPLE_RATE / block_size:.0f} blocks/s needed for real time")
+    for seconds in (0.5, 1.0, 2.5, 5.0):
+        reverb = ConvolutionReverb(rng.standard_normal((int(seconds * SAMPLE_RATE), 2)))
+        blocks_per_second = measure(lambda: reverb.process(block, out=block), 1, repeats=200)
+        print(f"  {seconds:.1f} s impulse response, {reverb.num_partitions:4d} partitions {blocks_per_second:10.0f} blocks/s")
+
+
+def bench_grains():
+    from grains import EVENT_FIELDS, GrainEngine
+
+    print("grains")
+    rng = np.random.default_rng(0)
+    num_frames = int(SAMPLE_RATE * 0.1)
+    block = np.zeros((num_frames, 2), dtype=np.float32)
+    for events_per_second in (30, 300, 2000):
+        grains = GrainEngine(SAMPLE_RATE, seed=0)
+        count = events_per_second * num_frames // SAMPLE_RATE
+        events = rng.random((count, EVENT_FIELDS)).astype(np.float32)
+        events[:, 0] = rng.integers(0, 3, count)
+        frame = [0]
+
+        def step():
+            grains.trigger(events, frame[0], num_frames)
+            grains.render(block, frame[0])
+            frame[0] += num_frames
+
+        for _ in range(10):  # Reach a steady number of live grains
+            step()
+        report(f"{events_per_second} events/s, {grains.active.sum()} live grains", measure(step, num_frames))
+
+
+def bench_limiter():
+    from effects import PeakLimiter
+
+    print("limiter")
+    rng = np.random.default_rng(0)
+    for num_frames in (512, 4410):
+        block = (rng.standard_normal((num_frames, 2)) * 0.8).astype(np.float32)
+        limiter = PeakLimiter(SAMPLE_RATE)
+        report(f"{num_frames}-frame stereo blocks, streaming", measure(lambda: limiter.process(block), num_frames))
+        report(f"{num_frames}-frame stereo sound, sound_gains", measure(lambda: limiter.sound_gains(block), num_frames))
+
+
+def bench_multirate():
+    print("multirate")
+    num_samples = SAMPLE_RATE * 2
+    print(f" {num_samples} samples of a two-partial layer")
+    for bandwidth in (40.0, 300.0, 1000.0):
+        def layer(t):
+            return 0.02 * np.sin(2 * np.pi * bandwidth * t) + 0.01 * np.sin(np.pi * bandwidth * t)
+        factor = decimation_factor(bandwidth, SAMPLE_RATE)
+        report(f"{bandwidth:.0f} Hz, full rate", measure(lambda: layer(np.arange(num_samples) / SAMPLE_RATE), num_samples))
+        report(f"{bandwidth:.0f} Hz, 1/{factor} rate and interpolated",
+               measure(lambda: render_multirate(layer, 0.0, num_samples, SAMPLE_RATE, bandwidth), num_samples))
+
+
+def bench_batch():
+    from audio_engine import AudioEngine
+
+    print("batch")
+    num_rows = 300
+    rng = np.random.default_rng(0)
+    parameters = np.column_stack([rng.uniform(0, 2, num_rows), rng.uniform(0, 90, num_rows),
+                                  rng.uniform(0, 1, num_rows), rng.uniform(0, 1, num_rows)])
+    engine = AudioEngine(backend=None, duration=1 / 30)
+    print(f" {num_rows} frames of {engine.duration * 1000:.1f} ms")
+    for mode_name in ('PulsatingAudioMode', 'EtherealAmbientMode', 'MysticalForestMode', 'RainSoundMode'):
+        engine.set_mode(mode_name)
+        num_samples = num_rows * engine.mode.generate_sound().shape[0]
+        keys = list(engine.mode.DEFAULTS)
+        report(f"{mode_name}, generate_sound per frame",
+               measure(lambda: [engine.mode.generate_sound(**dict(zip(keys, row))) for row in parameters], num_samples, 5))
+        report(f"{mode_name}, generate_batch", measure(lambda: engine.generate_batch(parameters), num_samples, 5))
+    engine.close()
+
+
+def bench_spatial():
+    from spatial import SourceVoices
+
+    print("spatial")
+    rng = np.random.default_rng(0)
+    num_frames = int(SAMPLE_RATE * 0.1)
+    block = np.zeros((num_frames, 2), dtype=np.float32)
+    for count in (10, 100, 1000):
+        voices = SourceVoices(SAMPLE_RATE)
+        positions = rng.random((count, 2))
+
+        def step():
+            positions[:] += rng.normal(0, 0.01, positions.shape)  # Moving sources, so every block glides
+            voices.set_sources(positions)
+            voices.render(block)
+
+        report(f"{count} moving sources", measure(step, num_frames, 20))
+
+
+def bench_analysis():
+    from analysis import SpectrumAnalyzer
+
+    print("analysis")
+    rng = np.random.default_rng(0)
+    block = (rng.standard_normal((SAMPLE_RATE // 30, 2)) * 0.3).astype(np.float32)
+    for window_size in (1024, 2048, 4096):
+        analyzer = SpectrumAnalyzer(SAMPLE_RATE, window_size)
+
+        def step():
+            analyzer.push(block)
+            analyzer.analyze()
+
+        report(f"{window_size}-frame window, one visual frame per call", measure(step, len(block), 200))
+
+
+def bench_track():
+    import os
+    import tempfile
+    import wave
+
+    from track import WavTrack
+
+    print("track")
+    rng = np.random.default_rng(0)
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'track.wav')
+        with wave.open(path, 'wb') as wav:
+            wav.setnchannels(2)
+            wav.setsampwidth(2)
+            wav.setframerate(SAMPLE_RATE)
+            wav.writeframes(rng.integers(-8000, 8000, (SAMPLE_RATE * 60, 2)).astype('<i2').tobytes())
+        track = WavTrack(path, loop=True)
+        for num_frames in (512, 4410):
+            block = np.zeros((num_frames, 2), dtype=np.float32)
+            report(f"{num_frames}-frame blocks from a memory-mapped 16-bit file",
+                   measure(lambda: track.add_into(block), num_frames, 200))
+        track.close()
+
+
+BENCHMARKS = {
+    'wavetable': bench_wavetable,
+    'noise': bench_noise,
+    'graph': bench_graph,
+    'effects': bench_effects,
+    'additive': bench_additive,
+    'reverb': bench_reverb,
+    'grains': bench_grains,
+    'limiter': bench_limiter,
+    'multirate': bench_multirate,
+    'batch': bench_batch,
+    'spatial': bench_spatial,
+    'analysis': bench_analysis,
+    'track': bench_track,
+}
+
+if __name__ == "__main__":
+    for name in sys.argv[1:] or BENCHMARKS:
+        BENCHMARKS[name]()
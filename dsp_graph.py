@@ -0,0 +1,318 @@
+import numpy as np
+
+from effects import DelayLine
+
+
+class Block:
+    """What every node sees while one block is rendered."""
+
+    def __init__(self, num_frames, sample_rate, parameters, ramp):
+        self.num_frames = num_frames
+        self.sample_rate = sample_rate
+        self.parameters = parameters
+        self.ramp = ramp[:num_frames]  # 0, 1, 2, ... shared by the oscillators
+
+
+class Node:
+    """One block-processing step of a Graph.
+
+    Positional inputs are nodes whose output this node reads. Keyword controls are
+    constants, callables of the visual parameters dict (evaluated once per block)
+    or nodes, which makes that control audio-rate. process() writes the block into
+    out in place and must not keep references to its input buffers.
+
+    When a Graph renders a batch, out and the inputs are (rows, num_frames): rows
+    are consecutive blocks, so out.reshape(-1) is one continuous stretch of
+    signal, and controls from parameters are (rows, 1) columns.
+    """
+
+    def __init__(self, *inputs, **controls):
+        self.inputs = inputs
+        self.controls = controls
+
+    def sources(self):
+        return list(self.inputs) + [value for value in self.controls.values() if isinstance(value, Node)]
+
+    def reset(self):
+        """Forget any state carried from one block to the next."""
+
+    def process(self, out, inputs, controls, block):
+        raise NotImplementedError
+
+
+class Signal(Node):
+    """Copies in blocks from render(num_frames), e.g. a baked loop's LoopPlayer."""
+
+    def __init__(self, render):
+        super().__init__()
+        self.render = render
+
+    def process(self, out, inputs, controls, block):
+        out.reshape(-1)[:] = self.render(out.size)
+
+
+class Oscillator(Node):
+    """Sine oscillator whose phase carries over from block to block.
+
+    An audio-rate frequency is integrated sample by sample, so it frequency-modulates
+    the tone without clicks.
+    """
+
+    def __init__(self, frequency, amplitude=1.0):
+        super().__init__(frequency=frequency, amplitude=amplitude)
+        self.phase = 0.0  # In cycles
+
+    def reset(self):
+        self.phase = 0.0
+
+    def process(self, out, inputs, controls, block):
+        frequency = controls['frequency']
+        if np.shape(frequency) == out.shape:
+            flat, frequency = out.reshape(-1), frequency.reshape(-1)
+            np.cumsum(frequency, out=flat)
+            flat -= frequency  # Phase at each sample is the sum of the frequencies before it
+            flat *= 1.0 / block.sample_rate
+            advance = flat[-1] + frequency[-1] / block.sample_rate
+            out += self.phase
+        else:
+            increment = np.divide(frequency, block.sample_rate)
+            np.multiply(block.ramp, increment, out=out)
+            # Each row of a batch starts where the one before it left off
+            steps = np.broadcast_to(increment * block.num_frames, out.shape[:-1] + (1,))
+            starts = np.cumsum(steps, axis=0) - steps
+            out += (starts + self.phase) % 1.0
+            advance = steps.sum()
+        self.phase = (self.phase + advance) % 1.0
+        out *= 2 * np.pi
+        np.sin(out, out=out)
+        out *= controls['amplitude']
+
+
+class Partials(Node):
+    """Sum of many sine partials from an OscillatorBank or SpectralBank.
+
+    frequencies and amplitudes are arrays (usually callables of the parameters
+    returning arrays); the bank keeps every partial's phase running between blocks.
+    """
+
+    def __init__(self, bank, frequencies, amplitudes=None):
+        super().__init__(frequencies=frequencies, amplitudes=amplitudes)
+        self.bank = bank
+
+    @staticmethod
+    def _rows(values, num_rows):
+        """values, an array or a list mixing constants and (rows, 1) columns, as a (rows, partials) array."""
+        if isinstance(values, (list, tuple)):
+            return np.stack([np.broadcast_to(np.reshape(value, -1), (num_rows,)) for value in values], axis=1)
+        values = np.asarray(values, dtype=np.float64)
+        return np.broadcast_to(values, (num_rows, values.shape[-1]))
+
+    def process(self, out, inputs, controls, block):
+        frequencies, amplitudes = controls['frequencies'], controls['amplitudes']
+        if out.ndim == 1:
+            self.bank.set_partials(frequencies, amplitudes)
+            out[:] = self.bank.render(block.num_frames)
+        else:
+            if amplitudes is not None:
+                amplitudes = self._rows(amplitudes, len(out))
+            out[:] = self.bank.render_rows(self._rows(frequencies, len(out)), amplitudes, block.num_frames)
+
+
+class LFO(Oscillator):
+    """Low-frequency sine swinging between offset - depth and offset + depth."""
+
+    def __init__(self, rate, depth=1.0, offset=0.0):
+        super().__init__(rate, depth)
+        self.controls['offset'] = offset
+
+    def process(self, out, inputs, controls, block):
+        super().process(out, inputs, controls, block)
+        out += controls['offset']
+
+
+class Noise(Node):
+    """Noise scaled by amplitude.
+
+    'white', 'pink' and 'brown' read views of a NoiseBank; 'smooth' joins `points`
+    random breakpoints across the block with straight lines.
+    """
+
+    def __init__(self, kind='white', amplitude=1.0, bank=None, points=10):
+        super().__init__(amplitude=amplitude)
+        if kind != 'smooth' and bank is None:
+            raise ValueError(f"{kind} noise needs a NoiseBank")
+        self.kind = kind
+        self.bank = bank
+        self.points = points
+
+    def process(self, out, inputs, controls, block):
+        if self.kind == 'smooth':
+            breakpoints = np.linspace(0, block.num_frames, self.points)
+            values = np.random.uniform(-1, 1, out.shape[:-1] + (self.points,))  # Fresh breakpoints for every row
+            segment = np.minimum(np.searchsorted(breakpoints, block.ramp, 'right') - 1, self.points - 2)
+            fraction = (block.ramp - breakpoints[segment]) / (breakpoints[segment + 1] - breakpoints[segment])
+            np.multiply(values[..., segment], 1 - fraction, out=out)
+            out += values[..., segment + 1] * fraction
+        else:
+            out.reshape(-1)[:] = self.bank.block(self.kind, out.size)
+        out *= controls['amplitude']
+
+
+class Envelope(Node):
+    """Applies linear attack and release ramps of fade frames to its input."""
+
+    def __init__(self, source, fade):
+        super().__init__(source)
+        self.fade = fade
+        self._attack = np.linspace(0, 1, fade)
+        self._release = self._attack[::-1]
+
+    def process(self, out, inputs, controls, block):
+        out[:] = inputs[0]
+        fade = min(self.fade, block.num_frames // 2)
+        out[..., :fade] *= self._attack[:fade]
+        out[..., block.num_frames - fade:] *= self._release[self.fade - fade:]
+
+
+class Gain(Node):
+    """Input times gain, which may itself be a signal (e.g. an LFO for tremolo)."""
+
+    def __init__(self, source, gain):
+        super().__init__(source, gain=gain)
+
+    def process(self, out, inputs, controls, block):
+        np.multiply(inputs[0], controls['gain'], out=out)
+
+
+class Mix(Node):
+    """Sum of the inputs."""
+
+    def process(self, out, inputs, controls, block):
+        out[:] = inputs[0]
+        for signal in inputs[1:]:
+            out += signal
+
+
+class Delay(Node):
+    """Input delayed by a fixed number of seconds through a DelayLine, optionally fed back into itself."""
+
+    def __init__(self, source, seconds, feedback=0.0):
+        super().__init__(source, feedback=feedback)
+        self.seconds = seconds
+        self.line = None  # Allocated on the first block, once the sample rate is known
+
+    def reset(self):
+        self.line = None
+
+    def process(self, out, inputs, controls, block):
+        if self.line is None:
+            self.line = DelayLine(int(self.seconds * block.sample_rate))
+        self.line.process(inputs[0].reshape(-1), len(self.line.buffer), controls['feedback'], out=out.reshape(-1))
+
+
+class Effect(Node):
+    """Runs its input through a stateful effect from the effects module (a filter, Chorus, ...)."""
+
+    def __init__(self, source, effect):
+        super().__init__(source)
+        self.effect = effect
+
+    def reset(self):
+        self.effect.reset()
+
+    def process(self, out, inputs, controls, block):
+        self.effect.process(inputs[0].reshape(-1), out=out.reshape(-1))
+
+
+class Graph:
+    """Renders the outputs of a DAG of nodes block by block.
+
+    Nodes run in topological order. Their outputs live in a pool of preallocated
+    buffers sized at construction: a buffer goes back to the pool as soon as its
+    last reader has run, so the pool holds only as many blocks as are ever alive
+    at once and rendering allocates nothing beyond what individual nodes need.
+    """
+
+    def __init__(self, outputs, sample_rate, max_frames):
+        self.outputs = list(outputs)
+        self.sample_rate = sample_rate
+        self.order = self._topological_order()
+
+        # Give every node a slot in the pool, reusing slots whose readers are all done
+        position = {node: index for index, node in enumerate(self.order)}
+        last_read = {node: len(self.order) if node in self.outputs else index for index, node in enumerate(self.order)}
+        for node in self.order:
+            for source in node.sources():
+                last_read[source] = max(last_read[source], position[node])
+        self.slots = {}
+        free, num_slots = [], 0
+        for index, node in enumerate(self.order):
+            if free:
+                self.slots[node] = free.pop()
+            else:
+                self.slots[node] = num_slots
+                num_slots += 1
+            for source in set(node.sources()):
+                if last_read[source] == index:
+                    free.append(self.slots[source])
+        self.num_slots = num_slots
+        self._allocate(max_frames)
+
+    def _topological_order(self):
+        order, done, visiting = [], set(), set()
+
+        def visit(node):
+            if node in done:
+                return
+            if node in visiting:
+                raise ValueError("DSP graph has a cycle")
+            visiting.add(node)
+            for source in node.sources():
+                visit(source)
+            visiting.discard(node)
+            done.add(node)
+            order.append(node)
+
+        for output in self.outputs:
+            visit(output)
+        return order
+
+    def _allocate(self, max_frames):
+        self.max_frames = max_frames
+        self.buffers = np.zeros((self.num_slots, max_frames))
+        self.ramp = np.arange(max_frames, dtype=np.float64)
+
+    def reset(self):
+        for node in self.order:
+            node.reset()
+
+    def render(self, num_frames, parameters=None, rows=None):
+        """One block of every output, as views into the pool that stay valid until the next render.
+
+        With rows, renders that many consecutive blocks in one pass, as (rows,
+        num_frames) outputs; parameters may then hold (rows, 1) columns, one
+        value per block, and the result is what rendering the blocks one by one
+        would give.
+        """
+        total = num_frames * (rows or 1)
+        if total > self.max_frames:
+            self._allocate(total)
+        parameters = parameters or {}
+        block = Block(num_frames, self.sample_rate, parameters, self.ramp)
+        views = {}
+        for node in self.order:
+            out = self.buffers[self.slots[node], :total]
+            if rows is not None:
+                out = out.reshape(rows, num_frames)
+            inputs = [views[source] for source in node.inputs]
+            controls = {}
+            for name, value in node.controls.items():
+                if isinstance(value, Node):
+                    controls[name] = views[value]
+                elif callable(value):
+                    controls[name] = value(parameters)
+                else:
+                    controls[name] = value
+            node.process(out, inputs, controls, block)
+            views[node] = out
+        return [views[output] for output in self.outputs]
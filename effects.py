@@ -0,0 +1,311 @@
+import numpy as np
+
+
+class DelayLine:
+    """Circular buffer of past samples, read back a whole number of frames later.
+
+    With feedback, each sample written is the input plus feedback times what is
+    read back, so the buffer carries a decaying train of echoes. A block is
+    processed in chunks no longer than the delay, which makes every chunk one
+    vectorized step, and the buffer carries over from one block to the next.
+    """
+
+    def __init__(self, max_delay):
+        self.buffer = np.zeros(max_delay)
+        self.position = 0  # Where the next sample is written
+        self._scratch = np.empty(max_delay)
+
+    def reset(self):
+        self.buffer[:] = 0
+        self.position = 0
+
+    def _read(self, start, out):
+        start %= len(self.buffer)
+        first = min(len(out), len(self.buffer) - start)
+        out[:first] = self.buffer[start:start + first]
+        out[first:] = self.buffer[:len(out) - first]
+
+    def _write(self, start, samples):
+        first = min(len(samples), len(self.buffer) - start)
+        self.buffer[start:start + first] = samples[:first]
+        self.buffer[:len(samples) - first] = samples[first:]
+
+    def process(self, block, delay, feedback=0.0, out=None):
+        """block delayed by delay frames (at most max_delay); out must not be block itself."""
+        if out is None:
+            out = np.empty(len(block))
+        for start in range(0, len(block), delay):
+            stop = min(start + delay, len(block))
+            delayed = out[start:stop]
+            self._read(self.position - delay, delayed)
+            if feedback:
+                written = np.multiply(delayed, feedback, out=self._scratch[:stop - start])
+                written += block[start:stop]
+                self._write(self.position, written)
+            else:
+                self._write(self.position, block[start:stop])
+            self.position = (self.position + stop - start) % len(self.buffer)
+        return out
+
+
+class IIRFilter:
+    """IIR filter with coefficients b, a whose state carries over from block to block.
+
+    The filter runs as a transposed direct form II state-space system, CHUNK
+    frames at a time: each chunk's response to its own input is one matrix
+    product for the whole block, and only the few state values are stepped from
+    chunk to chunk in Python.
+    """
+    CHUNK = 128
+
+    def __init__(self, b, a, chunk=CHUNK):
+        self.chunk = chunk
+        self.state = None
+        self.set_coefficients(b, a)
+
+    def set_coefficients(self, b, a):
+        """Switch to new coefficients, keeping the current state so the change doesn't click."""
+        a = np.asarray(a, dtype=np.float64)
+        b = np.asarray(b, dtype=np.float64) / a[0]
+        a = a / a[0]
+        order = max(len(a), len(b)) - 1
+        a = np.pad(a, (0, order + 1 - len(a)))
+        b = np.pad(b, (0, order + 1 - len(b)))
+
+        transition = np.zeros((order, order))
+        transition[:, 0] = -a[1:]
+        transition[:-1, 1:] = np.eye(order - 1)
+        drive = b[1:] - a[1:] * b[0]
+
+        powers = [np.eye(order)]
+        for _ in range(self.chunk):
+            powers.append(transition @ powers[-1])
+        self.powers = np.array(powers)  # transition ** k for k in 0..chunk
+        driven = self.powers[:self.chunk] @ drive  # transition ** k @ drive
+
+        # Output of a chunk = response to its input + response to the state it starts in
+        impulse = np.concatenate([[b[0]], driven[:-1, 0]])
+        lag = np.arange(self.chunk)[:, None] - np.arange(self.chunk)
+        self.response = np.where(lag >= 0, impulse[np.maximum(lag, 0)], 0.0)
+        self.from_state = self.powers[:self.chunk, 0, :]
+        # State after a chunk = state it started in carried forward + what its input added
+        self.to_state = driven[::-1].T
+
+        if self.state is None or len(self.state) != order:
+            self.state = np.zeros(order)
+
+    def reset(self):
+        self.state[:] = 0
+
+    def process(self, block, out=None):
+        """Filter a contiguous block; out must not be block itself."""
+        if out is None:
+            out = np.empty(len(block))
+        chunk = self.chunk
+        num_chunks = len(block) // chunk
+        state = self.state
+        if num_chunks:
+            inputs = block[:num_chunks * chunk].reshape(num_chunks, chunk)
+            outputs = out[:num_chunks * chunk].reshape(num_chunks, chunk)
+            np.matmul(inputs, self.response.T, out=outputs)
+            added = inputs @ self.to_state.T
+            starts = np.empty((num_chunks, len(state)))
+            carry = self.powers[chunk]
+            for index in range(num_chunks):
+                starts[index] = state
+                state = carry @ state + added[index]
+            outputs += starts @ self.from_state.T
+
+        remainder = len(block) - num_chunks * chunk
+        if remainder:
+            tail = block[num_chunks * chunk:]
+            out[num_chunks * chunk:] = self.response[:remainder, :remainder] @ tail + self.from_state[:remainder] @ state
+            state = self.powers[remainder] @ state + self.to_state[:, chunk - remainder:] @ tail
+        self.state = state
+        return out
+
+
+class OnePole(IIRFilter):
+    """Gentle 6 dB/octave 'lowpass' or 'highpass' filter."""
+
+    def __init__(self, cutoff, sample_rate, kind='lowpass'):
+        self.sample_rate = sample_rate
+        self.kind = kind
+        super().__init__(*self._coefficients(cutoff))
+
+    def _coefficients(self, cutoff):
+        pole = np.exp(-2 * np.pi * cutoff / self.sample_rate)
+        if self.kind == 'lowpass':
+            return [1 - pole], [1, -pole]
+        if self.kind == 'highpass':
+            return [(1 + pole) / 2, -(1 + pole) / 2], [1, -pole]
+        raise ValueError(f"Unknown one-pole filter kind: {self.kind}")
+
+    def set_cutoff(self, cutoff):
+        self.set_coefficients(*self._coefficients(cutoff))
+
+
+class Biquad(IIRFilter):
+    """Second-order 'lowpass', 'highpass', 'bandpass' or 'notch' filter (RBJ cookbook)."""
+
+    def __init__(self, frequency, sample_rate, kind='lowpass', q=0.7071):
+        self.sample_rate = sample_rate
+        self.kind = kind
+        self.q = q
+        super().__init__(*self._coefficients(frequency))
+
+    def _coefficients(self, frequency):
+        w0 = 2 * np.pi * frequency / self.sample_rate
+        cos_w0 = np.cos(w0)
+        alpha = np.sin(w0) / (2 * self.q)
+        numerators = {
+            'lowpass': [(1 - cos_w0) / 2, 1 - cos_w0, (1 - cos_w0) / 2],
+            'highpass': [(1 + cos_w0) / 2, -(1 + cos_w0), (1 + cos_w0) / 2],
+            'bandpass': [alpha, 0.0, -alpha],
+            'notch': [1.0, -2 * cos_w0, 1.0],
+        }
+        if self.kind not in numerators:
+            raise ValueError(f"Unknown biquad kind: {self.kind}")
+        return numerators[self.kind], [1 + alpha, -2 * cos_w0, 1 - alpha]
+
+    def set_frequency(self, frequency):
+        self.set_coefficients(*self._coefficients(frequency))
+
+
+class Chorus:
+    """A few copies of the input read back through slowly wobbling short delays.
+
+    Each voice's delay is swept by its own phase of one LFO, and reads between
+    samples interpolate linearly. The last max-delay frames of input and the LFO
+    phase carry over from block to block.
+    """
+
+    def __init__(self, sample_rate, voices=3, delay=0.02, depth=0.003, rate=0.25, mix=0.5):
+        self.sample_rate = sample_rate
+        self.delay = delay  # Seconds, centre of the sweep
+        self.depth = depth  # Seconds either side of the centre
+        self.rate = rate  # Hz
+        self.mix = mix
+        self.offsets = np.arange(voices)[:, None] / voices  # LFO phase of each voice, in cycles
+        self.phase = 0.0
+        self.history = np.zeros(int(np.ceil((delay + depth) * sample_rate)) + 2)
+        self._work = np.empty(0)
+
+    def reset(self):
+        self.history[:] = 0
+        self.phase = 0.0
+
+    def process(self, block, out=None):
+        if out is None:
+            out = np.empty(len(block))
+        num_frames = len(block)
+        past = len(self.history)
+        if len(self._work) < past + num_frames:
+            self._work = np.empty(past + num_frames)
+        work = self._work[:past + num_frames]
+        work[:past] = self.history
+        work[past:] = block
+
+        # Read position of every voice at every frame, as an index into work
+        frames = np.arange(num_frames)
+        phases = self.phase + self.offsets + frames * (self.rate / self.sample_rate)
+        delays = (self.delay + self.depth * np.sin(2 * np.pi * phases)) * self.sample_rate
+        positions = past + frames - delays
+        index = positions.astype(np.intp)
+        fraction = positions - index
+        wet = work[index] * (1 - fraction) + work[index + 1] * fraction
+
+        np.multiply(block, 1 - self.mix, out=out)
+        out += wet.mean(axis=0) * self.mix
+        self.history[:] = work[num_frames:]
+        self.phase = (self.phase + num_frames * self.rate / self.sample_rate) % 1.0
+        return out
+
+
+class PeakLimiter:
+    """Lookahead peak limiter that keeps (frames, channels) blocks under ceiling.
+
+    Each frame's gain is the smallest gain any frame in the next lookahead frames
+    needs, allowed to recover by at most 20 dB per release seconds, and smoothed
+    by a lookahead-long moving average, so the gain is already down when a peak
+    arrives and never jumps. A whole block's gain curve comes from a sliding
+    minimum, a running minimum and a convolution, with no loop over frames.
+
+    process() streams, delaying its input by lookahead frames; sound_gains()
+    limits a complete sound, whose future is already known. Both record the peak
+    they saw and the most gain reduction they applied, in dB, for metering.
+    """
+    CEILING = 0.98
+    LOOKAHEAD = 0.0015  # Seconds
+    RELEASE = 0.2  # Seconds to recover 20 dB
+
+    def __init__(self, sample_rate, ceiling=CEILING, lookahead=LOOKAHEAD, release=RELEASE, channels=2):
+        self.ceiling = ceiling
+        self.lookahead = max(1, int(lookahead * sample_rate))
+        self.recovery = np.log(10.0) / (release * sample_rate)  # Natural-log gain rise per frame
+        self.channels = channels
+        self.peak_db = -np.inf
+        self.reduction_db = 0.0
+        self.limited_blocks = 0  # Blocks in which the gain went down at all
+        self._work = np.empty((0, channels), dtype=np.float32)
+        self.reset()
+
+    def reset(self):
+        self.held = np.zeros((self.lookahead, self.channels), dtype=np.float32)  # Input not played out yet
+        self.gains = np.ones(self.lookahead)  # Unsmoothed gains of the last frames out
+
+    def _required(self, frames, metered):
+        """Gain each frame needs to stay under the ceiling; the metered frames count towards peak_db."""
+        levels = np.abs(frames).max(axis=1)
+        peak = levels[metered].max()
+        self.peak_db = 20 * np.log10(peak) if peak > 0 else -np.inf
+        return self.ceiling / np.maximum(levels, self.ceiling)
+
+    def _gain_curve(self, required, num_frames, previous):
+        """Unsmoothed and smoothed gains for num_frames frames.
+
+        required runs lookahead - 1 frames past them and previous holds the
+        unsmoothed gains of the lookahead frames before them.
+        """
+        window = np.lib.stride_tricks.sliding_window_view(required, self.lookahead)[:num_frames].min(axis=1)
+
+        # gain[j] = min(window[j], gain[j - 1] * e ** recovery), unrolled into a running minimum in the log domain
+        rise = np.arange(1, num_frames + 1) * self.recovery
+        log_gain = np.log(window) - rise
+        np.minimum.accumulate(log_gain, out=log_gain)
+        np.minimum(log_gain, np.log(previous[-1]), out=log_gain)
+        log_gain += rise
+        gains = np.concatenate([previous[1:], np.exp(log_gain)])
+
+        smoothed = np.convolve(gains, np.full(self.lookahead, 1.0 / self.lookahead), 'valid')
+        self.reduction_db = -20 * np.log10(smoothed.min())
+        if self.reduction_db > 1e-9:
+            self.limited_blocks += 1
+        return gains[-self.lookahead:], smoothed
+
+    def process(self, block, out=None):
+        """block limited and delayed by lookahead frames; out may be block itself."""
+        num_frames = len(block)
+        if out is None:
+            out = np.empty_like(block)
+        if num_frames == 0:
+            return out
+        if len(self._work) < num_frames + self.lookahead:
+            self._work = np.empty((num_frames + self.lookahead, self.channels), dtype=np.float32)
+        work = self._work[:num_frames + self.lookahead]
+        work[:self.lookahead] = self.held
+        work[self.lookahead:] = block
+
+        # The held frames go out first, so gains are worked out for them and all but the newest lookahead frames
+        required = self._required(work, slice(self.lookahead, None))[:num_frames + self.lookahead - 1]
+        self.gains, gain = self._gain_curve(required, num_frames, self.gains)
+        self.held[:] = work[num_frames:]
+        np.multiply(work[:num_frames], gain[:, None], out=out, casting='unsafe')
+        return out
+
+    def sound_gains(self, frames):
+        """Gain for every frame of a complete sound so it stays under the ceiling, leaving the stream's state alone."""
+        required = np.concatenate([self._required(frames, slice(None)), np.ones(self.lookahead - 1)])
+        # Start from the gain the first frames need, so the smoothing can't let the opening through
+        start = np.full(self.lookahead, required[:self.lookahead].min())
+        return self._gain_curve(required, len(frames), start)[1]
@@ -0,0 +1,137 @@
+import numpy as np
+
+from audio_output import RingBuffer
+
+# Visual events the audio side reacts to. Each travels as a row (kind, x, y, intensity),
+# with kind an index into EVENT_KINDS and x, y the event's position as fractions of the screen.
+EVENT_KINDS = ('bounce', 'respawn', 'build')
+EVENT_FIELDS = 4
+
+
+class EventChannel:
+    """Bounded queue of visual events from the render loop to the audio side.
+
+    Events are rows of a RingBuffer, so like the audio ring it needs no lock and
+    can live in shared memory; events that don't fit are dropped and counted.
+    """
+
+    def __init__(self, capacity=1024, ring=None):
+        self.ring = RingBuffer(capacity, EVENT_FIELDS) if ring is None else ring
+        self._drained = np.empty((self.ring.capacity, EVENT_FIELDS), dtype=np.float32)
+
+    @property
+    def dropped(self):
+        return self.ring.overruns
+
+    def push(self, events):
+        """Queue (kind, x, y, intensity) tuples, kind being one of EVENT_KINDS."""
+        if not events:
+            return
+        rows = np.array([(EVENT_KINDS.index(kind), x, y, intensity) for kind, x, y, intensity in events],
+                        dtype=np.float32)
+        self.ring.write(rows)
+
+    def drain(self):
+        """Every queued event as an (n, EVENT_FIELDS) array, valid until the next drain."""
+        rows = self._drained[:self.ring.available()]
+        self.ring.read_into(rows)
+        return rows
+
+
+class GrainEngine:
+    """Short percussive sine grains, one per visual event, mixed into output blocks.
+
+    Grains live in a preallocated pool of parallel arrays. Rendering a block
+    gathers every sample that any active grain contributes to it into flat
+    arrays and adds them into the block with one np.bincount per channel, so
+    there is no Python loop over grains however many are playing.
+    """
+    MAX_GRAINS = 4096
+    ATTACK = 0.002  # Seconds of linear fade-in, so grains don't click
+    # What each kind of event sounds like: (frequency at mid-screen in Hz, seconds to fade to -60 dB, amplitude)
+    VOICES = {
+        'bounce': (330.0, 0.08, 0.12),
+        'respawn': (1760.0, 0.04, 0.015),
+        'build': (110.0, 0.15, 0.08),
+    }
+
+    def __init__(self, sample_rate, max_grains=MAX_GRAINS, seed=None):
+        self.sample_rate = sample_rate
+        self.rng = np.random.default_rng(seed)
+        self.active = np.zeros(max_grains, dtype=bool)
+        self.start = np.zeros(max_grains, dtype=np.int64)  # Output frame the grain starts on
+        self.length = np.zeros(max_grains, dtype=np.int64)
+        self.increment = np.zeros(max_grains)  # Cycles per frame
+        self.amplitude = np.zeros(max_grains)
+        self.decay = np.zeros(max_grains)  # Natural-log fall per frame
+        self.gains = np.zeros((max_grains, 2))  # Equal-power left and right gains
+        self.dropped = 0  # Grains not started because the pool was full
+        self.triggered = 0
+
+        voices = [self.VOICES[kind] for kind in EVENT_KINDS]
+        self._frequencies = np.array([frequency for frequency, _, _ in voices])
+        self._lengths = np.array([int(seconds * sample_rate) for _, seconds, _ in voices])
+        self._amplitudes = np.array([amplitude for _, _, amplitude in voices])
+        self._attack = max(1, int(self.ATTACK * sample_rate))
+
+    def trigger(self, events, at_frame, spread=0):
+        """Start a grain for each (n, EVENT_FIELDS) event row at at_frame, scattered over spread frames.
+
+        Higher on screen is higher in pitch (up to an octave either side) and x pans the grain.
+        """
+        count = len(events)
+        if count == 0:
+            return
+        slots = np.flatnonzero(~self.active)[:count]
+        self.dropped += count - len(slots)
+        events = events[:len(slots)]
+        kinds = events[:, 0].astype(np.intp)
+        x = np.clip(events[:, 1], 0.0, 1.0)
+        y = np.clip(events[:, 2], 0.0, 1.0)
+
+        self.active[slots] = True
+        self.start[slots] = at_frame + (self.rng.integers(0, spread, len(slots)) if spread > 0 else 0)
+        self.length[slots] = self._lengths[kinds]
+        self.increment[slots] = self._frequencies[kinds] * 2.0 ** (1.0 - 2.0 * y) / self.sample_rate
+        self.amplitude[slots] = self._amplitudes[kinds] * events[:, 3]
+        self.decay[slots] = np.log(1000.0) / self._lengths[kinds]
+        self.gains[slots, 0] = np.cos(0.5 * np.pi * x)
+        self.gains[slots, 1] = np.sin(0.5 * np.pi * x)
+        self.triggered += len(slots)
+
+    def render(self, mix, block_start):
+        """Add every active grain's samples for the block starting at output frame block_start into mix (n, 2)."""
+        num_frames = len(mix)
+        grains = np.flatnonzero(self.active)
+        if len(grains) == 0:
+            return
+        offset = self.start[grains] - block_start
+        first = np.maximum(offset, 0)  # Block frame where the grain's samples start
+        elapsed = first - offset  # Grain frame at that point
+        counts = np.clip(np.minimum(num_frames - first, self.length[grains] - elapsed), 0, None)
+
+        total = int(counts.sum())
+        if total:
+            # One entry per (grain, frame) pair that lands in this block; per-grain values are
+            # spread over their entries with np.repeat, and the maths runs in float32
+            starts = (np.cumsum(counts) - counts).astype(np.int32)
+            within = np.arange(total, dtype=np.int32) - np.repeat(starts, counts)
+            frames = np.repeat(first.astype(np.int32), counts) + within
+            within += np.repeat(elapsed.astype(np.int32), counts)
+            age = within.astype(np.float32)  # Frames since each grain started
+
+            # Phase in cycles, wrapped into [0, 1) so float32 np.sin stays on its fast path
+            samples = np.multiply(age, np.repeat(self.increment[grains].astype(np.float32), counts))
+            samples -= np.floor(samples)
+            samples *= np.float32(2 * np.pi)
+            np.sin(samples, out=samples)
+            envelope = np.multiply(age, np.repeat(-self.decay[grains].astype(np.float32), counts))
+            samples *= np.exp(envelope, out=envelope)
+            attacking = within < self._attack
+            samples[attacking] *= age[attacking] / self._attack
+            for channel in range(mix.shape[1]):
+                gains = (self.amplitude[grains] * self.gains[grains, channel]).astype(np.float32)
+                mix[:, channel] += np.bincount(frames, samples * np.repeat(gains, counts), num_frames)
+
+        finished = self.start[grains] + self.length[grains] <= block_start + num_frames
+        self.active[grains[finished]] = False
@@ -1,3 +1,5 @@
+import sys
+
 import pygame
 import pygame_gui
 from visual_engine import VisualEngine
@@ -16,29 +18,51 @@ VALMORPHANIZE_BUTTON_Y = 60
 WHITE = (255, 255, 255)
 
 
-# Initialize pygame
-pygame.init()
-manager = pygame_gui.UIManager((WIDTH, HEIGHT))  # Initialize UI Manager
+def main():
+    # Initialize pygame here rather than at import time, so the audio worker process
+    # (which re-imports this module on spawn-based platforms) doesn't open a window
+    pygame.init()
+    manager = pygame_gui.UIManager((WIDTH, HEIGHT))  # Initialize UI Manager
 
-# Screen setup
-screen = pygame.display.set_mode((WIDTH, HEIGHT))
-pygame.display.set_caption('A Fractal Experience')
+    # Screen setup
+    screen = pygame.display.set_mode((WIDTH, HEIGHT))
+    pygame.display.set_caption('A Fractal Experience')
 
-def main():
     clock = pygame.time.Clock()
     running = True
 
     # Dynamically fetch all audio mode classes inside AudioEngine
-    audio_mode_classes = [cls for name, cls in AudioEngine.__dict__.items() if isinstance(cls, type) and issubclass(cls, AudioEngine.BaseAudioMode) and cls is not AudioEngine.BaseAudioMode]
+    audio_mode_classes = AudioEngine.mode_classes()
     audio_mode_names = [cls.__name__ for cls in audio_mode_classes]
 
     # Check if audio_mode_names is not empty
     if not audio_mode_names:
         raise ValueError("No audio modes found!")
 
-    # Instantiate AudioEngine
-    audio_engine = AudioEngine()
-    default_mode = AudioEngine.DefaultAudioMode(audio_engine=audio_engine)
+    # --reverb adds the procedural hall, --reverb=PATH convolves with a WAV impulse response (streaming output only)
+    reverb = next((arg.partition('=')[2] or True for arg in sys.argv if arg.split('=')[0] == '--reverb'), False)
+    # --track=PATH loops a WAV file in place of the generative modes, for the visuals to react to
+    track = next((arg.partition('=')[2] for arg in sys.argv if arg.startswith('--track=')), None)
+    # --record=PATH archives everything played to a WAV file; it needs the streaming output, not pygame's mixer
+    record = next((arg.partition('=')[2] for arg in sys.argv if arg.startswith('--record=')), None)
+    # --midi=PORT sends the default mode's notes to a MIDI synth instead, --midi=PATH.mid writes them down
+    midi = next((arg.partition('=')[2] for arg in sys.argv if arg.startswith('--midi=')), None)
+
+    # Instantiate AudioEngine, optionally in its own process to keep it clear of the render loop
+    if '--audio-worker' in sys.argv:
+        from audio_worker import AudioWorker
+        audio_engine = AudioWorker(reverb=reverb, track=track, record=record, midi=midi)
+    else:
+        audio_engine = AudioEngine()
+        if reverb:
+            audio_engine.set_reverb(None if reverb is True else reverb)
+        if track:
+            audio_engine.play_track(track, loop=True)
+        if record:
+            audio_engine.start_recording(record)
+        if midi:
+            from midi_output import open_midi
+            audio_engine.attach_midi(open_midi(midi, audio_engine.sample_rate))
 
 
     # Dynamically fetch all fractal classes inside VisualEngine
@@ -73,7 +97,7 @@ def main():
                 # Handle audio dropdown selection
                 if event.ui_element == audio_drop_down_menu:
                     selected_audio_mode = event.text
-                    audio_engine.mode = audio_mode_classes[audio_mode_names.index(selected_audio_mode)](audio_engine=audio_engine)
+                    audio_engine.set_mode(selected_audio_mode)
 
                 # Handle visual dropdown selection
                 elif event.ui_element == drop_down_menu:
@@ -88,15 +112,23 @@ def main():
                 if mute_button.is_over(pygame.mouse.get_pos()):
                     mute_button.toggle_mute()
 
+        # Visuals that listen react to what the audio side last played
+        if hasattr(current_fractal, 'react_to_audio'):
+            current_fractal.react_to_audio(audio_engine.analyzer)
+
         # Update and draw fractal
         if hasattr(current_fractal, 'update'):
             current_fractal.update()
         current_fractal.draw()
 
-        # Generate and play sound
-        audio_parameters = current_fractal.get_audio_parameters()
-        sound = audio_engine.generate_tone_with_envelope(audio_parameters)
-        audio_engine.play_sound(sound)
+        # Hand the latest parameters to the audio scheduler, which fires notes on its own tempo grid
+        audio_engine.set_parameters(current_fractal.get_audio_parameters())
+        if hasattr(current_fractal, 'get_audio_events'):
+            audio_engine.add_events(current_fractal.get_audio_events())
+        # Visuals made of many moving objects give each one a voice where it is on screen
+        audio_engine.set_sources(*(current_fractal.get_audio_sources() if hasattr(current_fractal, 'get_audio_sources')
+                                   else ((), None)))
+        audio_engine.update()
 
         # Draw the button after the fractal
         quit_button.draw(screen)
@@ -110,6 +142,7 @@ def main():
 
         pygame.display.flip()
 
+    audio_engine.close()
     pygame.quit()
 
 if __name__ == "__main__":
@@ -0,0 +1,100 @@
+import heapq
+import itertools
+
+try:
+    import mido
+except ImportError:
+    mido = None
+
+
+class MidiOutput:
+    """Plays the engine's notes on an external synth over MIDI, or writes them to a Standard MIDI File.
+
+    Notes arrive with their start frame on the engine's clock and wait in a
+    heap as note-on and note-off messages until update() reaches their frame.
+    port is a mido output port, the name of one to open, or anything else with
+    a send(message) method; with path instead, the messages go into a .mid file
+    that close() saves, timed by their frames rather than by when update() ran.
+    A note struck again while still sounding is only released by its last
+    note-off, so overlapping notes don't cut each other short.
+    """
+    VELOCITY = 80
+
+    def __init__(self, sample_rate, port=None, path=None, channel=0, bpm=150, ticks_per_beat=480):
+        if mido is None:
+            raise RuntimeError("mido is not available")
+        if (port is None) == (path is None):
+            raise ValueError("MidiOutput needs either a port or a path")
+        self.sample_rate = sample_rate
+        self.channel = channel
+        self.path = path
+        self._owns_port = isinstance(port, str)
+        self.port = mido.open_output(port) if self._owns_port else port
+        self.notes_sent = 0
+        self._pending = []  # (frame, note-offs first, arrival order, message) heap
+        self._order = itertools.count()
+        self._held = {}  # Note number -> how many of its note-ons are still sounding
+        if path is not None:
+            self.file = mido.MidiFile(ticks_per_beat=ticks_per_beat)
+            self.track = mido.MidiTrack()
+            self.file.tracks.append(self.track)
+            self._tempo = mido.bpm2tempo(bpm)
+            self.track.append(mido.MetaMessage('set_tempo', tempo=self._tempo, time=0))
+            self._first_frame = None  # The file starts at the first message
+            self._ticks = 0  # Ticks written so far
+
+    def play(self, note, start_frame, seconds, velocity=VELOCITY):
+        """Queue a note of seconds length starting at start_frame."""
+        note = int(note)
+        stop_frame = start_frame + int(seconds * self.sample_rate)
+        heapq.heappush(self._pending, (start_frame, 1, next(self._order),
+                                       mido.Message('note_on', channel=self.channel, note=note, velocity=velocity)))
+        heapq.heappush(self._pending, (stop_frame, 0, next(self._order),
+                                       mido.Message('note_off', channel=self.channel, note=note)))
+
+    def update(self, now):
+        """Send every message due by frame now."""
+        while self._pending and self._pending[0][0] <= now:
+            frame, _, _, message = heapq.heappop(self._pending)
+            self._send(frame, message)
+
+    def _send(self, frame, message):
+        held = self._held.get(message.note, 0)
+        if message.type == 'note_on':
+            self._held[message.note] = held + 1
+            self.notes_sent += 1
+        else:
+            self._held[message.note] = held - 1
+            if held > 1:
+                return  # Struck again since, so it keeps sounding
+
+        if self.port is not None:
+            self.port.send(message)
+            return
+        if self._first_frame is None:
+            self._first_frame = frame
+        ticks = int(round(mido.second2tick((frame - self._first_frame) / self.sample_rate,
+                                           self.file.ticks_per_beat, self._tempo)))
+        self.track.append(message.copy(time=max(ticks - self._ticks, 0)))
+        self._ticks = max(ticks, self._ticks)
+
+    def close(self):
+        """Finish up: a file gets every queued note and is saved, a port has its sounding notes released."""
+        if self.port is None:
+            self.update(float('inf'))
+            self.file.save(self.path)
+            return
+        self._pending = []
+        for note, count in self._held.items():
+            if count > 0:
+                self.port.send(mido.Message('note_off', channel=self.channel, note=note))
+        self._held = {}
+        if self._owns_port:
+            self.port.close()
+
+
+def open_midi(target, sample_rate):
+    """A MidiOutput writing to target if it names a .mid file, else sending to the port it names."""
+    if target.lower().endswith(('.mid', '.midi')):
+        return MidiOutput(sample_rate, path=target)
+    return MidiOutput(sample_rate, port=target)
@@ -0,0 +1,89 @@
+"""Precomputed note, scale and chord frequency tables.
+
+Everything here is built once at import time, so the audio hot path only does
+dict and array lookups. pretty_midi is imported only for note names these
+tables don't cover.
+"""
+import numpy as np
+
+# Semitone offset of each note name from C in the same octave
+PITCH_CLASSES = {
+    'Cb': -1, 'C': 0, 'C#': 1, 'Db': 1, 'D': 2, 'D#': 3, 'Eb': 3, 'E': 4, 'Fb': 4, 'E#': 5, 'F': 5,
+    'F#': 6, 'Gb': 6, 'G': 7, 'G#': 8, 'Ab': 8, 'A': 9, 'A#': 10, 'Bb': 10, 'B': 11, 'B#': 12,
+}
+
+# Note name (e.g. 'C4') -> MIDI note number, using the same convention as pretty_midi (C4 == 60)
+NOTE_NUMBERS = {
+    name + str(octave): (octave + 1) * 12 + offset
+    for octave in range(-1, 10)
+    for name, offset in PITCH_CLASSES.items()
+    if 0 <= (octave + 1) * 12 + offset < 128
+}
+
+# MIDI note number -> frequency in Hz
+MIDI_FREQUENCIES = 440.0 * 2.0 ** ((np.arange(128) - 69) / 12)
+
+# Frequency ratio of an interval of n semitones
+SEMITONE_RATIOS = 2.0 ** (np.arange(128) / 12)
+
+SCALES = {
+    'major': ["C", "D", "E", "F", "G", "A", "B"],
+    'natural_minor': ["C", "D", "Eb", "F", "G", "Ab", "Bb"],
+    'phrygian': ["C", "Db", "Eb", "E", "Gb", "Ab", "Bb"],
+    'lydian': ["C", "D", "E", "F#", "G", "A", "B"],
+    'mixolydian': ["C", "D", "E", "F", "G", "A", "Bb"],
+    'harmonic_minor': ["C", "D", "Eb", "F", "G", "Ab", "B"],
+    'dorian': ["C", "D", "E", "F", "G", "A", "Bb"],
+    'pentatonic': ["C", "D", "Eb", "F", "G", "Ab", "Bb"],
+    'locrian': ["C", "Db", "E", "F", "Gb", "Ab", "Bb"],
+}
+
+CHORDS = {
+    'major': [0, 4, 7],
+    'minor': [0, 3, 7],
+    'diminished': [0, 3, 6],
+    'augmented': [0, 4, 8],
+    'sus2': [0, 2, 7],
+    'sus4': [0, 5, 7],
+    'major7': [0, 4, 7, 11],
+    'minor7': [0, 3, 7, 10],
+    'dominant7': [0, 4, 7, 10],
+}
+
+# Frequency ratios of each chord relative to its root
+CHORD_RATIOS = {name: SEMITONE_RATIOS[intervals] for name, intervals in CHORDS.items()}
+
+NUM_OCTAVES = 9  # Scale tables cover octaves 0 through 8
+
+
+def note_name_to_number(note_name):
+    """MIDI note number for a note name such as 'C4' or 'F#3'."""
+    number = NOTE_NUMBERS.get(note_name)
+    if number is None:
+        import pretty_midi  # Only needed for unusual spellings
+        number = pretty_midi.note_name_to_number(note_name)
+    return number
+
+
+def note_to_frequency(note_name):
+    """Frequency in Hz of a note name such as 'C4'."""
+    return MIDI_FREQUENCIES[note_name_to_number(note_name)]
+
+
+_scale_tables = {}
+
+
+def scale_frequencies(scale):
+    """(NUM_OCTAVES, len(scale)) array of the frequency of every note of scale in each octave."""
+    key = tuple(scale)
+    table = _scale_tables.get(key)
+    if table is None:
+        numbers = [[note_name_to_number(note + str(octave)) for note in scale] for octave in range(NUM_OCTAVES)]
+        table = MIDI_FREQUENCIES[np.array(numbers)]
+        table.setflags(write=False)
+        _scale_tables[key] = table
+    return table
+
+
+# Every named scale is built up front
+SCALE_FREQUENCIES = {name: scale_frequencies(scale) for name, scale in SCALES.items()}
@@ -0,0 +1,77 @@
+import threading
+import wave
+
+import numpy as np
+
+from audio_output import RingBuffer
+
+
+class WavRecorder:
+    """Archives the output to a 16-bit WAV file without ever making the audio side wait on the disk.
+
+    record() only copies each block into a preallocated RingBuffer, the same
+    lock-free queue the output uses. A daemon thread drains it in WRITE_SECONDS
+    chunks, converting into reused buffers, so the file is written in a few large
+    sequential writes a second. Blocks that arrive while the queue is full are
+    dropped whole and counted rather than written torn.
+    """
+    QUEUE_SECONDS = 10.0  # How far the disk may fall behind before blocks are dropped
+    WRITE_SECONDS = 1.0
+
+    def __init__(self, path, sample_rate, channels=2, queue_seconds=QUEUE_SECONDS, write_seconds=WRITE_SECONDS):
+        self.path = path
+        self.sample_rate = sample_rate
+        self.write_seconds = write_seconds
+        self.ring = RingBuffer(int(queue_seconds * sample_rate), channels)
+        self.ring.buffer.fill(0)  # Fault the pages in now rather than on the audio side
+        self.dropped = 0  # Blocks lost because the writer fell behind
+        self.frames_written = 0
+        self._chunk = np.empty((min(int(write_seconds * sample_rate), self.ring.capacity), channels), dtype=np.float32)
+        self._pcm = np.empty(self._chunk.shape, dtype=np.int16)
+        self._wav = wave.open(path, 'wb')
+        self._wav.setnchannels(channels)
+        self._wav.setsampwidth(2)
+        self._wav.setframerate(sample_rate)
+        self._wake = threading.Event()
+        self._closing = False
+        self._thread = threading.Thread(target=self._write_loop, daemon=True)
+        self._thread.start()
+
+    @property
+    def seconds(self):
+        return self.frames_written / self.sample_rate
+
+    def record(self, frames):
+        """Queue mono (n,) or (n, channels) float frames; returns False if the block was dropped."""
+        if len(frames) > self.ring.free():
+            self.dropped += 1
+            return False
+        self.ring.write(frames)
+        if self.ring.available() >= len(self._chunk):
+            self._wake.set()
+        return True
+
+    def _write_loop(self):
+        while not self._closing:
+            woken = self._wake.wait(self.write_seconds)
+            self._wake.clear()
+            self._drain(len(self._chunk) if woken else 1)  # Whatever is queued goes out at least once a chunk
+        self._drain(1)
+
+    def _drain(self, minimum):
+        """Write up to a chunk at a time while at least minimum frames are queued."""
+        while self.ring.available() >= minimum:
+            chunk = self._chunk[:min(len(self._chunk), self.ring.available())]
+            self.ring.read_into(chunk)
+            np.clip(chunk, -1.0, 1.0, out=chunk)
+            pcm = self._pcm[:len(chunk)]
+            np.multiply(chunk, 32767, out=pcm, casting='unsafe')
+            self._wav.writeframes(pcm)  # Also patches the header, so the file stays playable if we crash
+            self.frames_written += len(chunk)
+
+    def close(self):
+        """Write out whatever is still queued and finish the file."""
+        self._closing = True
+        self._wake.set()
+        self._thread.join()
+        self._wav.close()
@@ -0,0 +1,37 @@
+class Scheduler:
+    """Tempo grid that hands out note start times a lookahead window ahead of playback.
+
+    Times are in frames of the output stream, so events land sample-accurately
+    no matter how unevenly the render loop asks for them.
+    """
+
+    def __init__(self, sample_rate, bpm=150, subdivision=4, lookahead=0.1):
+        self.sample_rate = sample_rate
+        self.bpm = bpm  # At 150 BPM a sixteenth lasts exactly the default 0.1 s sound
+        self.subdivision = subdivision  # Grid steps per beat
+        self.lookahead = lookahead  # Seconds ahead of the output that events are prepared
+        self.next_frame = 0.0
+        self.step_index = 0
+        self.skipped_steps = 0  # Steps dropped because the caller fell behind
+
+    def step_frames(self):
+        return 60.0 / self.bpm / self.subdivision * self.sample_rate
+
+    def lookahead_frames(self):
+        return int(self.lookahead * self.sample_rate)
+
+    def due(self, now, horizon):
+        """Start frames of every grid step before horizon, skipping steps that are already past."""
+        step = self.step_frames()
+        if self.next_frame < now - step:
+            missed = int((now - self.next_frame) // step)
+            self.skipped_steps += missed
+            self.step_index += missed
+            self.next_frame += missed * step
+
+        starts = []
+        while self.next_frame < horizon:
+            starts.append(int(round(self.next_frame)))
+            self.next_frame += step
+            self.step_index += 1
+        return starts
@@ -0,0 +1,116 @@
+import numpy as np
+
+
+class SpatialMixer:
+    """Mixes many positioned mono sources down to stereo with one matrix multiply per block.
+
+    Positions are (x, y) rows as fractions of the screen, the listener sitting
+    at its centre: x pans each source with an equal-power law and sources
+    fade with their distance from the centre. When the sources are the same as
+    in the last block, their old and new gains sit side by side in one
+    (sources, 4) matrix, so the same single product gives the block mixed both
+    ways and moving sources glide across it instead of jumping.
+    """
+    ROLLOFF = 1.0  # Gain falls to 1 / (1 + ROLLOFF) at the middle of a screen edge
+
+    def __init__(self, rolloff=ROLLOFF):
+        self.rolloff = rolloff
+        self.previous = None  # Gains of the last block's sources
+        self._ramp = np.zeros(0, dtype=np.float32)
+
+    def gains(self, positions, levels=None):
+        """(sources, 2) left and right gains for (sources, 2) positions and optional per-source levels."""
+        positions = np.asarray(positions, dtype=np.float32)
+        x = np.clip(positions[:, 0], 0.0, 1.0)
+        distance = 2 * np.hypot(x - 0.5, positions[:, 1] - 0.5)
+        level = 1 / (1 + self.rolloff * distance)
+        if levels is not None:
+            level *= levels
+        angle = 0.5 * np.pi * x
+        return np.stack([np.cos(angle) * level, np.sin(angle) * level], axis=1)
+
+    def reset(self):
+        self.previous = None
+
+    def mix(self, signals, positions, levels=None, out=None):
+        """Stereo (frames, 2) mix of (sources, frames) signals at (sources, 2) positions."""
+        gains = self.gains(positions, levels)
+        num_frames = signals.shape[1]
+        if out is None:
+            out = np.empty((num_frames, 2), dtype=np.float32)
+        if self.previous is None or self.previous.shape != gains.shape:
+            np.matmul(signals.T, gains, out=out)
+        else:
+            both = signals.T @ np.concatenate([self.previous, gains], axis=1)
+            if len(self._ramp) < num_frames:
+                self._ramp = np.empty(num_frames, dtype=np.float32)
+            ramp = self._ramp[:num_frames]
+            ramp[:] = np.arange(1, num_frames + 1) / num_frames
+            np.subtract(both[:, 2:], both[:, :2], out=out)
+            out *= ramp[:, None]
+            out += both[:, :2]
+        self.previous = gains
+        return out
+
+
+class SourceVoices:
+    """A soft sine for each positioned visual object, mixed into the output where the object is.
+
+    Higher on screen is higher in pitch, over two octaves. Sources keep their
+    index from one call of set_sources() to the next, so each keeps its phase
+    and glides as it moves; the whole cloud is scaled by one over the square
+    root of its size so it is about as loud with ten objects as with a thousand.
+    The sines run in float32 from phases wrapped into [0, 1), which keeps a
+    thousand of them well inside a block's time budget.
+    """
+    MAX_SOURCES = 1024
+    LOWEST_FREQUENCY = 220.0
+    GAIN = 0.05
+
+    def __init__(self, sample_rate, max_sources=MAX_SOURCES):
+        self.sample_rate = sample_rate
+        self.max_sources = max_sources
+        self.mixer = SpatialMixer()
+        self.positions = np.zeros((0, 2), dtype=np.float32)
+        self.levels = np.zeros(0, dtype=np.float32)
+        self.phases = np.zeros(0, dtype=np.float32)  # In cycles
+        self.increments = np.zeros(0, dtype=np.float32)  # Cycles per frame
+        self._signals = np.zeros((0, 0), dtype=np.float32)
+        self._ramp = np.zeros(0, dtype=np.float32)
+        self._mix = np.zeros((0, 2), dtype=np.float32)
+
+    def set_sources(self, positions, levels=None):
+        """(sources, 2) x, y screen fractions and optional (sources,) levels in [0, 1]."""
+        positions = np.array(positions, dtype=np.float32).reshape(-1, 2)[:self.max_sources]
+        count = len(positions)
+        if levels is None:
+            levels = np.ones(count)
+        self.positions = positions
+        self.levels = np.array(levels, dtype=np.float32)[:count] * np.float32(self.GAIN / np.sqrt(max(1, count)))
+        frequencies = self.LOWEST_FREQUENCY * 2.0 ** (2 * (1 - np.clip(positions[:, 1], 0.0, 1.0)))
+        self.increments = (frequencies / self.sample_rate).astype(np.float32)
+        if count != len(self.phases):
+            phases = np.zeros(count, dtype=np.float32)
+            kept = min(count, len(self.phases))
+            phases[:kept] = self.phases[:kept]
+            self.phases = phases
+
+    def render(self, mix):
+        """Add the next len(mix) frames of every source into mix (frames, 2)."""
+        count, num_frames = len(self.positions), len(mix)
+        if count == 0:
+            return
+        if self._signals.shape[0] < count or self._signals.shape[1] < num_frames:
+            self._signals = np.empty((max(count, self._signals.shape[0]), max(num_frames, self._signals.shape[1])),
+                                     dtype=np.float32)
+            self._ramp = np.arange(self._signals.shape[1], dtype=np.float32)
+            self._mix = np.empty((self._signals.shape[1], 2), dtype=np.float32)
+        signals = self._signals[:count, :num_frames]
+        np.multiply(self.increments[:, None], self._ramp[:num_frames], out=signals)
+        signals += self.phases[:, None]
+        signals -= np.floor(signals)
+        signals *= np.float32(2 * np.pi)
+        np.sin(signals, out=signals)
+        self.phases += self.increments * num_frames
+        self.phases -= np.floor(self.phases)
+        mix += self.mixer.mix(signals, self.positions, self.levels, out=self._mix[:num_frames])
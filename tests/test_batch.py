@@ -0,0 +1,33 @@
+import numpy as np
+
+from audio_engine import AudioEngine, NoiseBank
+
+PARAMETERS = np.random.default_rng(3).uniform(0, 1, (12, 4)) * [1, 90, 1, 1]
+
+
+def render(mode_name, batch):
+    """Every row's sound from a freshly seeded engine, as one batch or generated frame by frame."""
+    np.random.seed(7)
+    engine = AudioEngine(backend=None)
+    engine.noise = NoiseBank(seed=1)
+    engine.set_mode(mode_name)
+    if batch:
+        sounds = engine.generate_batch(PARAMETERS)
+    else:
+        sounds = [engine.mode.generate_sound(**dict(zip(engine.mode.DEFAULTS, row))).copy() for row in PARAMETERS]
+    return [np.asarray(sound) for sound in sounds]
+
+
+def check_batch_matches_frames(mode_name):
+    batch, frames = render(mode_name, True), render(mode_name, False)
+    assert len(batch) == len(frames)
+    for batch_sound, frame_sound in zip(batch, frames):
+        np.testing.assert_allclose(batch_sound, frame_sound, atol=1e-6)
+
+
+def test_graph_mode_batch_matches_frames():
+    check_batch_matches_frames('PulsatingAudioMode')
+
+
+def test_layered_mode_batch_matches_frames():
+    check_batch_matches_frames('DesertNightMode')
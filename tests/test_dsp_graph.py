@@ -0,0 +1,54 @@
+import numpy as np
+
+from dsp_graph import LFO, Envelope, Gain, Graph, Mix, Oscillator
+
+SAMPLE_RATE = 8000
+BLOCK = 256
+FREQUENCIES = np.array([220.0, 247.5, 261.0, 293.25, 330.0])
+FADE = 32
+
+
+def build_graph():
+    """Enough nodes that pool slots get reused, one output read twice, a per-block control and an audio-rate one."""
+    melody = Oscillator(lambda p: p['frequency'], 0.5)
+    fixed = Oscillator(330.0, 0.25)
+    vibrato = Oscillator(LFO(5.0, depth=10.0, offset=220.0), 0.1)
+    tremolo = LFO(3.0, depth=0.2, offset=1.0)
+    # fixed is read again after several other nodes have run, so its slot must stay taken until then
+    echo = Gain(fixed, 0.5)
+    return Graph([Envelope(Mix(Gain(Mix(melody, fixed, vibrato), tremolo), echo), FADE)], SAMPLE_RATE, BLOCK)
+
+
+def expected():
+    """The same signal computed directly over the whole stretch, as (blocks, BLOCK)."""
+    n = np.arange(len(FREQUENCIES) * BLOCK)
+    t = n / SAMPLE_RATE
+
+    def running_phase(frequency):
+        return (np.cumsum(frequency) - frequency) / SAMPLE_RATE  # Phase before each sample
+
+    melody = 0.5 * np.sin(2 * np.pi * running_phase(np.repeat(FREQUENCIES, BLOCK)))
+    fixed = 0.25 * np.sin(2 * np.pi * 330.0 * t)
+    vibrato = 0.1 * np.sin(2 * np.pi * running_phase(220.0 + 10.0 * np.sin(2 * np.pi * 5.0 * t)))
+    tremolo = 1.0 + 0.2 * np.sin(2 * np.pi * 3.0 * t)
+    blocks = ((melody + fixed + vibrato) * tremolo + 0.5 * fixed).reshape(len(FREQUENCIES), BLOCK)
+    blocks[:, :FADE] *= np.linspace(0, 1, FADE)
+    blocks[:, -FADE:] *= np.linspace(1, 0, FADE)
+    return blocks
+
+
+def test_slots_are_reused():
+    graph = build_graph()
+    assert graph.num_slots < len(graph.order)
+
+
+def test_block_by_block_matches_direct_computation():
+    graph = build_graph()
+    blocks = [graph.render(BLOCK, {'frequency': frequency})[0].copy() for frequency in FREQUENCIES]
+    np.testing.assert_allclose(blocks, expected(), atol=1e-9)
+
+
+def test_batch_matches_direct_computation():
+    graph = build_graph()
+    batch = graph.render(BLOCK, {'frequency': FREQUENCIES[:, None]}, rows=len(FREQUENCIES))[0]
+    np.testing.assert_allclose(batch, expected(), atol=1e-9)
@@ -0,0 +1,156 @@
+import mmap
+import struct
+
+import numpy as np
+
+PCM, IEEE_FLOAT, EXTENSIBLE = 1, 3, 0xFFFE
+
+
+class WavTrack:
+    """A WAV file played straight out of a memory map, for driving the visuals from recordings.
+
+    The data chunk is mapped read-only and frames is a zero-copy numpy view of
+    it, so blocks are views too and only the float conversion into the caller's
+    buffer touches the samples. Pages already played are handed back to the OS
+    every RELEASE_BYTES, so a multi-hour file streams in constant memory.
+    Reads 8, 16, 24 and 32-bit PCM and 32 and 64-bit float, any channel count
+    (mono plays on both channels, beyond two only the first two are used).
+    """
+    RELEASE_BYTES = 8 * 2 ** 20
+
+    def __init__(self, path, loop=False):
+        self.path = path
+        self.loop = loop
+        self._file = open(path, 'rb')
+        try:
+            self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:  # An empty file can't be mapped
+            self._file.close()
+            raise ValueError(f"{path} is not a WAV file")
+        try:
+            self._open()
+        except Exception:
+            self.close()
+            raise
+        self.position = 0  # Next frame read_into() reads
+        self._released = 0  # Bytes of the data chunk given back to the OS
+        self._scratch = np.zeros((0, 2), dtype=np.float32)
+        if hasattr(mmap, 'MADV_SEQUENTIAL'):
+            self._map.madvise(mmap.MADV_SEQUENTIAL)
+
+    def _open(self):
+        if self._map[:4] != b'RIFF' or self._map[8:12] != b'WAVE':
+            raise ValueError(f"{self.path} is not a WAV file")
+        offset, fmt = 12, None
+        while offset + 8 <= len(self._map):
+            chunk_id, size = struct.unpack_from('<4sI', self._map, offset)
+            offset += 8
+            if chunk_id == b'fmt ':
+                fmt = struct.unpack_from('<HHIIHH', self._map, offset)
+                if fmt[0] == EXTENSIBLE:
+                    fmt = (struct.unpack_from('<H', self._map, offset + 24)[0],) + fmt[1:]
+            elif chunk_id == b'data':
+                break
+            offset += size + (size & 1)  # Chunks are padded to an even length
+        else:
+            raise ValueError(f"{self.path} has no data chunk")
+        if fmt is None:
+            raise ValueError(f"{self.path} has no fmt chunk")
+
+        audio_format, self.channels, self.sample_rate, _, block_align, bits = fmt
+        self.sample_width = bits // 8
+        dtypes = {(PCM, 1): np.uint8, (PCM, 2): '<i2', (PCM, 3): np.uint8, (PCM, 4): '<i4',
+                  (IEEE_FLOAT, 4): '<f4', (IEEE_FLOAT, 8): '<f8'}
+        if (audio_format, self.sample_width) not in dtypes:
+            raise ValueError(f"Unsupported WAV format {audio_format} with {bits}-bit samples")
+        # Recorders that never went back to fill in the size leave it 0 or 0xFFFFFFFF
+        remaining = len(self._map) - offset
+        self.num_frames = (min(size, remaining) if size else remaining) // block_align
+        self.data_offset = offset
+        self.block_align = block_align
+        shape = (self.num_frames, self.channels, 3) if self.sample_width == 3 else (self.num_frames, self.channels)
+        self.frames = np.frombuffer(self._map, dtypes[audio_format, self.sample_width], int(np.prod(shape)),
+                                    offset).reshape(shape)
+        self._format = audio_format
+
+    @property
+    def seconds(self):
+        return self.num_frames / self.sample_rate
+
+    @property
+    def finished(self):
+        return not self.loop and self.position >= self.num_frames
+
+    def seek(self, frame):
+        self.position = min(max(int(frame), 0), self.num_frames)
+        self._released = min(self._released, self.position * self.block_align)
+
+    def read(self, start, out):
+        """Convert the frames from start into float32 stereo out (n, 2), zero past the end; returns the count."""
+        start = min(max(start, 0), self.num_frames)
+        count = min(len(out), self.num_frames - start)
+        raw = self.frames[start:start + count, :2]  # A mono (n, 1) block broadcasts onto both channels
+        target = out[:count]
+        if self.sample_width == 3:
+            # Little-endian 24-bit: the top byte carries the sign
+            np.multiply(raw[..., 2].view(np.int8), 2.0 ** -7, out=target, casting='unsafe')
+            target += raw[..., 1] * np.float32(2.0 ** -15)
+            target += raw[..., 0] * np.float32(2.0 ** -23)
+        elif self._format == IEEE_FLOAT:
+            target[:] = raw
+        elif self.sample_width == 1:
+            np.multiply(raw, 1 / 128, out=target, casting='unsafe')
+            target -= 1
+        else:
+            np.multiply(raw, 2.0 ** (1 - 8 * self.sample_width), out=target, casting='unsafe')
+        out[count:] = 0
+        return count
+
+    def read_wrapped(self, start, out):
+        """read(), except that a looping track carries on from its beginning instead of stopping at the end."""
+        if not self.loop or self.num_frames == 0:
+            return self.read(start, out)
+        start %= self.num_frames
+        filled = 0
+        while filled < len(out):
+            filled += self.read(start, out[filled:])
+            start = 0
+        return filled
+
+    def read_into(self, out):
+        """Fill out (n, 2) with the next frames, wrapping round when looping; returns frames of track read."""
+        filled = 0
+        while True:
+            count = self.read(self.position, out[filled:])
+            self.position += count
+            filled += count
+            if filled == len(out) or not self.loop or self.num_frames == 0:
+                break
+            self.seek(0)
+        self._release_played()
+        return filled
+
+    def add_into(self, mix):
+        """Mix the next len(mix) frames into mix (n, 2)."""
+        if len(self._scratch) < len(mix):
+            self._scratch = np.empty((len(mix), 2), dtype=np.float32)
+        block = self._scratch[:len(mix)]
+        self.read_into(block)
+        mix += block
+
+    def _release_played(self):
+        """Let the OS drop the pages behind the read position from memory."""
+        played = self.position * self.block_align
+        if played - self._released < self.RELEASE_BYTES or not hasattr(mmap, 'MADV_DONTNEED'):
+            return
+        start = (self.data_offset + self._released) // mmap.PAGESIZE * mmap.PAGESIZE
+        stop = (self.data_offset + played) // mmap.PAGESIZE * mmap.PAGESIZE
+        if stop > start:
+            self._map.madvise(mmap.MADV_DONTNEED, start, stop - start)
+        self._released = played
+
+    def close(self):
+        # The numpy views export the map's buffer, so they have to go before it can close
+        self.frames = None
+        self._map.close()
+        self._file.close()
@@ -36,6 +36,10 @@ class VisualEngine:
             self.zoom = random.uniform(0.8, 1.2)
             self.pan_x = random.uniform(-0.5, 0.5)
             self.pan_y = random.uniform(-0.5, 0.5)
+            self.brightness = 100  # Drives the zoom speed, following the low bands once audio is heard
+
+        def react_to_audio(self, analyzer):
+            self.brightness = 255 * float(np.mean(analyzer.levels[:4]))
 
         def get_audio_parameters(self):
             return {
@@ -64,8 +68,10 @@ class VisualEngine:
             self.screen.blit(upscaled_fractal, (0, 0))
             return np.mean(img_array)  # Return average brightness
 
-        def update(self, brightness=100):
+        def update(self, brightness=None):
             """Update the fractal's parameters for animation."""
+            if brightness is None:
+                brightness = self.brightness
             # Smooth panning
             self.pan_x += random.uniform(-0.002, 0.002)
             self.pan_y += random.uniform(-0.002, 0.002)
@@ -600,6 +606,16 @@ class VisualEngine:
             self.direction = 1  # 1 for outward, -1 for inward
             self.speed_boost = 1
 
+        def get_audio_sources(self):
+            """Every star's position as screen fractions, as loud as it is near."""
+            stars = np.array(self.stars, dtype=np.float32)
+            return stars[:, :2] / (WIDTH, HEIGHT), stars[:, 2]
+
+        def react_to_audio(self, analyzer):
+            """Kick the stars forward on every bass hit, harder the louder it is."""
+            if analyzer.onsets[:3].any():
+                self.speed_boost = max(self.speed_boost, 1 + 2 * float(analyzer.levels[:3].max()))
+
         def get_audio_parameters(self):
             return {
                 'color_intensity': 1,  # Default color intensity
@@ -705,6 +721,10 @@ class VisualEngine:
                 'pattern_density': self.arms / 300  # Normalize by max possible arms
             }
 
+        def react_to_audio(self, analyzer):
+            """Spin faster with more bass, the way the zoom level reported to the audio side would."""
+            self.speed = 0.05 * analyzer.audio_parameters()['zoom_level']
+
 
         def draw_bird_silhouette(self, x, y, angle):
             # Transformations for rotation
@@ -753,6 +773,17 @@ class VisualEngine:
         def __init__(self, screen):
             self.screen = screen
             self.balls = [(random.randint(50, WIDTH - 50), random.randint(50, HEIGHT - 50), random.uniform(-4, 4), random.uniform(-4, 4), random.randint(10, 30), (random.randint(0, 255), random.randint(0, 255), random.randint(0, 255)), 1, random.choice([-1, 1])) for _ in range(20)]
+            self.audio_events = []
+
+        def get_audio_events(self):
+            """Wall bounces since the last call, as (kind, x, y, intensity) tuples."""
+            events, self.audio_events = self.audio_events, []
+            return events
+
+        def get_audio_sources(self):
+            """Every ball's position as screen fractions, bigger balls louder."""
+            balls = np.array([(x, y, radius) for x, y, _, _, radius, _, _, _ in self.balls], dtype=np.float32)
+            return balls[:, :2] / (WIDTH, HEIGHT), balls[:, 2] / 32
 
         def get_audio_parameters(self):
             avg_speed = sum([speed for _, _, speed, _, _, _, _, _ in self.balls]) / len(self.balls)
@@ -777,12 +808,17 @@ class VisualEngine:
             for x, y, dx, dy, radius, color, size_oscillation, direction in self.balls:
                 x += dx
                 y += dy
+                bounced = False
                 if x - radius <= 0 or x + radius >= WIDTH:
                     dx = -dx
                     color = tuple(min(255, c + 10) for c in color)
+                    bounced = True
                 if y - radius <= 0 or y + radius >= HEIGHT:
                     dy = -dy
                     color = tuple(min(255, c + 10) for c in color)
+                    bounced = True
+                if bounced:
+                    self.audio_events.append(('bounce', x / WIDTH, y / HEIGHT, min(1.0, (abs(dx) + abs(dy)) / 8)))
 
                 # Oscillate the size of the ball with reduced magnitude and centered around the original size
                 size_oscillation += 0.02 * direction
@@ -992,6 +1028,12 @@ class VisualEngine:
             self.moon_y = np.random.randint(50, int(self.height * 0.5))
             self.moon_speed = 0.5
             self.moon_phase = np.random.choice(['full', 'crescent', 'half', 'gibbous'])
+            self.audio_events = []
+
+        def get_audio_events(self):
+            """Buildings placed since the last call, as (kind, x, y, intensity) tuples."""
+            events, self.audio_events = self.audio_events, []
+            return events
 
         def get_audio_parameters(self):
             return {
@@ -1080,6 +1122,8 @@ class VisualEngine:
             self.brush_x += self.brush_speed
             if self.brush_x < self.width:
                 self.buildings.append((self.brush_x, self.horizon - building_height, building_width, building_height, building_color))
+                self.audio_events.append(('build', self.brush_x / self.width, (self.horizon - building_height) / self.height,
+                                          building_height / (self.height - self.horizon)))
             else:
                 self.brush_x = 0
                 self.buildings.clear()
@@ -1184,9 +1228,11 @@ class VisualEngine:
                 self.x += self.speed * np.cos(angle)
                 self.y += self.speed * np.sin(angle)
 
-                # Wrap around the screen if the particle goes out of bounds
+                # Wrap around the screen if the particle goes out of bounds, reporting whether it did
+                wrapped = not (0 <= self.x < self.screen_width and 0 <= self.y < self.screen_height)
                 self.x %= self.screen_width
                 self.y %= self.screen_height
+                return wrapped
 
 
         def __init__(self, screen):
@@ -1209,6 +1255,17 @@ class VisualEngine:
                 (255, 255, 0),  # Yellow
                 (0, 255, 255),  # Cyan
             ]
+            self.audio_events = []
+
+        def get_audio_events(self):
+            """Particles that wrapped around to respawn on the far side since the last call."""
+            events, self.audio_events = self.audio_events, []
+            return events
+
+        def get_audio_sources(self):
+            """Every particle's position as screen fractions."""
+            positions = np.array([(particle.x, particle.y) for particle in self.particles], dtype=np.float32)
+            return positions / (self.width, self.height), None
 
         def get_audio_parameters(self):
             return {
@@ -1240,7 +1297,8 @@ class VisualEngine:
                 angle = noise_val * 2 * np.pi
 
                 # Update particle's velocity and position based on angle
-                particle.update(angle)
+                if particle.update(angle):
+                    self.audio_events.append(('respawn', particle.x / self.width, particle.y / self.height, 1.0))
 
                  # Use colors from the limited palette
                 color = self.color_palette[int((angle + self.color_shift) % len(self.color_palette))]
@@ -0,0 +1,65 @@
+import numpy as np
+
+
+class Voice:
+    """A sound that is currently playing, either on a pygame channel or on the streaming output."""
+
+    def __init__(self, sound, started_at, ends_at=None, start_frame=0):
+        self.sound = sound
+        self.start_frame = start_frame  # Output frame the voice starts on when streamed
+        self.position = 0  # Frames already mixed into the streaming output
+        self.started_at = started_at
+        self.ends_at = ends_at  # Wall-clock end for mixer voices; streamed voices end by position
+        self.level = max(sound.max(), -sound.min()) if len(sound) else 0.0
+        self.channel = None  # pygame channel when played through the mixer
+        self.buffer = None  # Pooled array the sound was rendered into
+
+    def finished(self, now):
+        if self.ends_at is None:
+            return self.position >= len(self.sound)
+        return now >= self.ends_at
+
+    def release(self, fade_frames):
+        """Cut the voice short with a quick linear fade from where it is now."""
+        tail = self.sound[self.position:self.position + fade_frames]
+        self.sound = tail * np.linspace(1, 0, len(tail), dtype=np.float32)[:, None]
+        self.position = 0
+
+
+class VoiceAllocator:
+    """Caps how many voices play at once and picks which one to steal when full.
+
+    steal_policy is 'oldest', 'quietest' or None; with None a full allocator
+    has no slot to give, so the engine skips synthesizing the new voice.
+    """
+
+    def __init__(self, max_voices=8, steal_policy='oldest'):
+        self.max_voices = max_voices
+        self.steal_policy = steal_policy
+        self.voices = []  # In start order, oldest first
+        self.stolen = 0
+        self.skipped = 0
+
+    def reap(self, now):
+        """Drop finished voices and return them."""
+        finished = [voice for voice in self.voices if voice.finished(now)]
+        if finished:
+            self.voices = [voice for voice in self.voices if not voice.finished(now)]
+        return finished
+
+    def has_slot(self):
+        return len(self.voices) < self.max_voices or self.steal_policy is not None
+
+    def allocate(self, voice):
+        """Add voice, returning the voices it displaced to stay within max_voices."""
+        stolen = []
+        while self.voices and len(self.voices) >= self.max_voices:
+            if self.steal_policy == 'quietest':
+                victim = min(self.voices, key=lambda playing: playing.level)
+            else:
+                victim = self.voices[0]
+            self.voices.remove(victim)
+            stolen.append(victim)
+        self.stolen += len(stolen)
+        self.voices.append(voice)
+        return stolen